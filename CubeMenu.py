@@ -21,6 +21,10 @@
 """Cube menu for FreeCAD - API."""
 
 
+import os
+import sys
+import json
+import time
 import CubeMenuCommon as cpc
 
 
@@ -67,6 +71,73 @@ def addMenu(menu=None):
 
     cp.addMenu(menuDefault)"""
 
+    spec = menuSpec(menu)
+
+    if spec:
+        wb, uid = spec
+        domain = ".".join(["CPMenu", "System", wb, uid])
+        group = cpc.findGroup(domain)
+        if not group:
+            group = cpc.newGroup(domain)
+        if group:
+            writeMenu(group, menu, domain)
+        else:
+            domain = None
+    else:
+        domain = None
+
+    return domain
+
+
+def addMenus(menus):
+    """addMenus(iterable)
+
+    Add many menus at once, menus are the same as for addMenu. All menus
+    are validated in one pass, new groups are allocated in bulk and the
+    index of each workbench is written once. Returns the list of domains
+    in the order of menus, with None for invalid menus.
+
+    import CubeMenu as cp
+
+
+    domains = cp.addMenus([menuDemo, menuDefault])"""
+
+    specs = []
+    new = {}
+    for menu in menus:
+        spec = menuSpec(menu)
+        if spec:
+            wb, uid = spec
+            domain = ".".join(["CPMenu", "System", wb, uid])
+            if not cpc.findGroup(domain):
+                if wb not in new:
+                    new[wb] = ([], set())
+                if uid not in new[wb][1]:
+                    new[wb][0].append(uid)
+                    new[wb][1].add(uid)
+            specs.append((menu, domain))
+        else:
+            specs.append((menu, None))
+
+    for wb in new:
+        cpc.newGroups("System", wb, new[wb][0])
+
+    domains = []
+    for menu, domain in specs:
+        group = None
+        if domain:
+            group = cpc.findGroup(domain)
+        if group:
+            writeMenu(group, menu, domain)
+            domains.append(domain)
+        else:
+            domains.append(None)
+
+    return domains
+
+
+def menuSpec(menu):
+    """Validate menu and return [workbench, uuid] or None."""
     # Workbench
     if menu and "workbench" in menu:
         wb = menu["workbench"]
@@ -84,34 +155,146 @@ def addMenu(menu=None):
         uid = None
 
     if wb and uid:
-        domain = ".".join(["CPMenu", "System", wb, uid])
-        group = cpc.findGroup(domain)
-        if not group:
-            group = cpc.newGroup(domain)
-        if group:
-            # UUID
-            group.SetString("uuid", uid)
-            # Name
-            if "name" in menu:
-                group.SetString("name", menu["name"])
-            # Commands
-            if "commands" in menu:
-                temp = []
-                for cmd in menu["commands"]:
-                    if cmd.startswith("CPMenu") and "," not in cmd:
-                        temp.append(cmd)
-                    elif "." not in cmd and "," not in cmd:
-                        temp.append(cmd)
-                    else:
-                        pass
-                group.SetString("commands", ",".join(temp))
-            # Default
-            if "default" in menu:
-                base = p.GetGroup("System").GetGroup(wb)
-                base.SetString("default", domain)
-        else:
-            domain = None
-    else:
-        domain = None
+        return [wb, uid]
+    return None
 
-    return domain
+
+def writeMenu(group, menu, domain):
+    """Write menu to the group."""
+    prefix, source, wb, uid = cpc.splitDomain(domain)
+    # UUID
+    group.SetString("uuid", uid)
+    # Name
+    if "name" in menu:
+        group.SetString("name", menu["name"])
+    # Commands
+    if "commands" in menu:
+        temp = []
+        for cmd in menu["commands"]:
+            if cmd.startswith("CPMenu") and "," not in cmd:
+                temp.append(cmd)
+            elif "." not in cmd and "," not in cmd:
+                temp.append(cmd)
+            else:
+                pass
+        group.SetString("commands", ",".join(temp))
+    # Default
+    if "default" in menu:
+        base = cpc.workbenchGroup(source, wb)
+        base.SetString("default", domain)
+
+
+def startupTimes():
+    """startupTimes()
+
+    Return cube menu startup breakdown in seconds, None for stages not
+    reached yet.
+
+    import CubeMenu as cp
+
+
+    cp.startupTimes()
+    # {"import": 0.01,                                  # Module import
+    #  "wait": 1.2,                                     # Until event loop
+    #  "bootstrap": 0.002,                              # Start
+    #  "ready": 1.2,                                    # Menus hooked
+    #  "menu": 0.004,                                   # First population
+    #  "firstMenu": 5.3}                                # Import to menu"""
+    return cpc.startupTimes()
+
+
+def setDiagnostics(enabled=True):
+    """setDiagnostics(bool)
+
+    Enable or disable timing of the cube menu hot paths. The setting is
+    kept between sessions.
+
+    import CubeMenu as cp
+
+
+    cp.setDiagnostics(True)"""
+    cpc.setDiagnostics(enabled)
+
+
+def diagnostics():
+    """diagnostics()
+
+    Return a snapshot of recorded timings in milliseconds, with startup
+    times and cache counters. Each timer has the call count, total, mean
+    and max, a histogram of calls up to each bound (the last bucket is
+    above all bounds) and the most recent calls as [time, ms].
+
+    import CubeMenu as cp
+
+
+    cp.diagnostics()
+    # {"enabled": True,
+    #  "bounds": [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000],
+    #  "timers": {"populateTop": {"count": 3,
+    #                             "total": 2.1,
+    #                             "mean": 0.7,
+    #                             "max": 1.5,
+    #                             "histogram": [0, 1, 1, 1, 0, 0, ...],
+    #                             "recent": [[1600000000.0, 0.3], ...]},
+    #             ...},
+    #  "startup": {...},                                # startupTimes()
+    #  "submenus": {...},                               # Submenu cache
+    #  "icons": {...}}                                  # Icon cache"""
+    import CubeMenuCommands as cpcmd
+
+    result = cpc.diagnostics()
+    result["startup"] = cpc.startupTimes()
+    result["submenus"] = cpcmd.submenuStats()
+    if "CubeMenuIcons" in sys.modules:
+        result["icons"] = sys.modules["CubeMenuIcons"].cacheStats()
+    return result
+
+
+def dumpDiagnostics(path=None):
+    """dumpDiagnostics(path)
+
+    Write diagnostics() as JSON, by default to Diagnostics.json in the
+    CubeMenu folder of the user data directory. Returns the file path.
+
+    import CubeMenu as cp
+
+
+    cp.dumpDiagnostics()"""
+    import FreeCAD as App
+
+    if not path:
+        path = os.path.join(App.getUserAppDataDir(),
+                            "CubeMenu",
+                            "Diagnostics.json")
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    result = diagnostics()
+    result["version"] = ".".join(str(v) for v in App.Version()[:3])
+    result["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    return path
+
+
+def captureProfiles(count=1, directory=None):
+    """captureProfiles(count, directory)
+
+    Capture cProfile and tracemalloc data of the next count menu shows
+    and preferences dialog opens. Files are written to the directory, by
+    default the CubeMenu/Profiles folder in the user data directory, and
+    rotated to keep the last 20 captures (Keep parameter of the Profile
+    group) and at most 50 MB (Size parameter, in KB). Count 0 stops.
+
+    import CubeMenu as cp
+
+
+    cp.captureProfiles(3)
+
+    # Inspect a capture
+    import pstats
+    pstats.Stats("CubeMenu-20201020-101500-123-menu-12ms.prof") \
+        .sort_stats("cumulative").print_stats(20)"""
+    if directory is not None:
+        cpc.profile.SetString("Directory", directory)
+    cpc.profile.SetInt("Count", max(int(count), 0))
@@ -0,0 +1,1028 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+"""Cube menu for FreeCAD - Benchmarks.
+
+Run from the FreeCAD Python console:
+
+import CubeMenuBenchmark
+CubeMenuBenchmark.benchAddActions()
+
+Or without FreeCAD, with the stand-ins from CubeMenuStubs, writing the
+results as JSON:
+
+QT_QPA_PLATFORM=offscreen python CubeMenuBenchmark.py --output r.json
+
+Compare with the baseline, exits non-zero on regressions:
+
+QT_QPA_PLATFORM=offscreen python CubeMenuBenchmark.py --baseline
+
+Write the default baseline:
+
+QT_QPA_PLATFORM=offscreen python CubeMenuBenchmark.py --update"""
+
+
+import os
+import ast
+import sys
+import json
+import time
+import timeit
+import platform
+if __name__ == "__main__":
+    import CubeMenuStubs
+    CubeMenuStubs.install()
+from PySide import QtGui
+from PySide import QtCore
+import FreeCAD as App
+import FreeCADGui as Gui
+import CubeMenuCommands as cpcmd
+
+
+mw = Gui.getMainWindow()
+prefix = "CubeMenuBench"
+path = os.path.dirname(os.path.abspath(__file__))
+quiet = {"on": False}
+baselinePath = os.path.join(path, "Resources", "benchmark", "Baseline.json")
+# Metrics checked against the baseline
+gateMetrics = ("actionListScan",
+               "actionListChange",
+               "populateTop",
+               "populateTopUnchanged",
+               "dialogLater")
+startupModules = set(["CubeMenu",
+                      "CubeMenuCommands",
+                      "CubeMenuCommon",
+                      "CubeMenuGlobalDefinitions",
+                      "CubeMenuGui"])
+
+
+def measure(function, repeat=20):
+    """Return the best time of repeated function calls in milliseconds."""
+    best = None
+    for i in range(repeat):
+        start = timeit.default_timer()
+        function()
+        elapsed = (timeit.default_timer() - start) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(title, columns, rows):
+    """Print results table to the report view."""
+    if quiet["on"]:
+        return
+    lines = [title, "  ".join(c.rjust(12) for c in columns)]
+    for row in rows:
+        lines.append("  ".join(str(r).rjust(12) for r in row))
+    App.Console.PrintMessage("\n".join(lines) + "\n")
+
+
+def benchActions(size):
+    """Create named benchmark actions."""
+    actions = []
+    for i in range(size):
+        a = QtGui.QAction(mw)
+        a.setObjectName(prefix + "_" + str(i))
+        a.setText(prefix + " " + str(i))
+        actions.append(a)
+    return actions
+
+
+def rebuild(menu, commands, actions):
+    """Reference implementation, empty the menu and add all actions."""
+    for act in menu.actions():
+        menu.removeAction(act)
+    for cmd in commands:
+        if cmd == "CPSeparator":
+            menu.addSeparator()
+        elif cmd in actions:
+            menu.addAction(actions[cmd])
+
+
+def benchAddActions(sizes=(10, 100, 1000), repeat=20):
+    """Cost of addActions for an unchanged menu and a one item change,
+       compared with rebuilding the menu."""
+    import CubeMenuCommon as cpc
+
+    results = {}
+    for size in sizes:
+        created = benchActions(size)
+        commands = []
+        for i, a in enumerate(created):
+            commands.append(a.objectName())
+            if i % 10 == 9:
+                commands.append("CPSeparator")
+        changed = list(commands)
+        changed[len(changed) // 2] = created[0].objectName()
+        actions = cpc.actionList()
+        menu = QtGui.QMenu()
+        state = {"flip": False}
+
+        def unchanged():
+            cpcmd.addActions(menu, commands)
+
+        def oneChange():
+            state["flip"] = not state["flip"]
+            if state["flip"]:
+                cpcmd.addActions(menu, changed)
+            else:
+                cpcmd.addActions(menu, commands)
+
+        def rebuildUnchanged():
+            rebuild(menu, commands, actions)
+
+        cpcmd.addActions(menu, commands)
+        results[size] = {
+            "unchanged": measure(unchanged, repeat),
+            "oneChange": measure(oneChange, repeat),
+            "rebuild": measure(rebuildUnchanged, repeat)}
+
+        menu.deleteLater()
+        for a in created:
+            a.deleteLater()
+
+    report("addActions (ms)",
+           ["entries", "unchanged", "one change", "rebuild"],
+           [[s,
+             "%.3f" % results[s]["unchanged"],
+             "%.3f" % results[s]["oneChange"],
+             "%.3f" % results[s]["rebuild"]] for s in sizes])
+    return results
+
+
+def benchRegistry(renames=100):
+    """Rename and late text checks of the action registry. Raises
+       AssertionError if an action is not found or its signals are
+       connected more than once."""
+    import CubeMenuCommon as cpc
+
+    owner = QtCore.QObject(mw)
+    action = QtGui.QAction(owner)
+    action.setObjectName(prefix + "_rename")
+    action.setText(prefix + " rename")
+    cpc.actionList()
+
+    def rename():
+        for i in range(renames):
+            action.setObjectName(prefix + "_rename" + str(i))
+
+    elapsed = measure(rename, 1) / renames
+    last = prefix + "_rename" + str(renames - 1)
+    signal = QtCore.SIGNAL("objectNameChanged(QString)")
+    assert action.receivers(signal) == 1, "objectNameChanged receivers"
+    assert cpc.findAction(last) is action, "renamed action"
+    assert cpc.findAction(prefix + "_rename") is None, "old name"
+
+    toolbar = QtGui.QToolBar(mw)
+    late = QtGui.QAction(toolbar)
+    late.setObjectName(prefix + "_late")
+    cpc.rescanActions()
+    assert cpc.findAction(prefix + "_late") is None, "action without text"
+    late.setText(prefix + " late")
+    assert cpc.findAction(prefix + "_late") is late, "widget owned action"
+    for i in range(3):
+        late.setParent(None)
+        cpc.rescanActions()
+        late.setParent(toolbar)
+        cpc.rescanActions()
+    destroyed = QtCore.SIGNAL("destroyed(QObject*)")
+    assert late.receivers(destroyed) == 1, "destroyed receivers"
+    assert late.receivers(QtCore.SIGNAL("changed()")) == 0, "changed"
+
+    owner.setParent(None)
+    toolbar.setParent(None)
+    cpc.rescanActions()
+    assert action.receivers(signal) == 0, "removed action receivers"
+    report("Action registry (ms)", ["renames", "rename"],
+           [[renames, "%.3f" % elapsed]])
+    return {"renames": renames, "rename": elapsed}
+
+
+def benchMirror(menus=100):
+    """Parameter edits through new group objects reach the menu mirror.
+       Raises AssertionError otherwise."""
+    import gc
+    import CubeMenuCommon as cpc
+
+    wb = prefix + "MirrorWorkbench"
+    domains = ["CPMenu.User." + wb + "." + prefix + str(i)
+               for i in range(menus)]
+    cpc.newGroups("User", wb, [d.split(".")[-1] for d in domains])
+    gc.collect()
+
+    def rename():
+        for i, d in enumerate(domains):
+            cpc.findGroup(d).SetString("name", "Menu " + str(i))
+
+    elapsed = measure(rename, 1) / menus
+    gc.collect()
+    names = [n for uid, n in cpc.menuList("User", wb)]
+    assert names == ["Menu " + str(i) for i in range(menus)], "menu names"
+    cpc.deleteGroup(domains[0])
+    gc.collect()
+    assert len(cpc.menuList("User", wb)) == menus - 1, "deleted menu"
+    cpc.sourceGroup("User").RemGroup(wb)
+    cpc.forget("User." + wb)
+
+    report("Menu mirror (ms)", ["menus", "rename"],
+           [[menus, "%.4f" % elapsed]])
+    return {"menus": menus, "rename": elapsed}
+
+
+def benchCompile(repeat=20):
+    """Compiled menus follow edits made through new group objects, once
+       the old ones are collected. Raises AssertionError otherwise."""
+    import gc
+    import CubeMenuCommon as cpc
+
+    wb = prefix + "CompileWorkbench"
+    domain = "CPMenu.User." + wb + "." + prefix + "Compile"
+    cpc.newGroup(domain).SetString("commands", "Std_ViewFront")
+    gc.collect()
+    first = cpcmd.compileMenu(wb, domain)[1]
+
+    def compiled():
+        cpcmd.compileMenu(wb, domain)
+
+    elapsed = measure(compiled, repeat)
+    cpc.findGroup(domain).SetString("commands", "Std_ViewTop")
+    gc.collect()
+    second = cpcmd.compileMenu(wb, domain)[1]
+    assert first == ["Std_ViewFront"], "compiled menu"
+    assert second == ["Std_ViewTop"], "stale compiled menu"
+    cpc.sourceGroup("User").RemGroup(wb)
+    cpc.forget("User." + wb)
+
+    report("Compiled menu (ms)", ["cached"], [["%.4f" % elapsed]])
+    return {"cached": elapsed}
+
+
+def benchDiagnostics(repeat=20):
+    """Toggling the diagnostics keeps the parameter revision, so compiled
+       menus stay valid. Raises AssertionError otherwise."""
+    import CubeMenuCommon as cpc
+
+    enabled = cpc.diag["enabled"]
+    revision = cpc.paramRevision()
+
+    def toggle():
+        cpc.setDiagnostics(not cpc.diag["enabled"])
+
+    elapsed = measure(toggle, repeat)
+    cpc.setDiagnostics(enabled)
+    assert cpc.paramRevision() == revision, "Diagnostics: revision changed"
+    report("Diagnostics toggle (ms)", ["toggle"], [["%.4f" % elapsed]])
+    return {"toggle": elapsed}
+
+
+def benchAddMenus(sizes=(100, 1000, 5000)):
+    """Repeated addMenu calls compared with one addMenus call."""
+    import CubeMenu as cp
+    import CubeMenuCommon as cpc
+
+    wb = prefix + "Workbench"
+    results = {}
+    for size in sizes:
+        menus = []
+        for i in range(size):
+            menus.append({"workbench": wb,
+                          "uuid": prefix + str(i),
+                          "name": "Menu " + str(i),
+                          "commands": ["Std_ViewFront",
+                                       "CPSeparator",
+                                       "Std_ViewTop"]})
+
+        def single():
+            for menu in menus:
+                cp.addMenu(menu)
+
+        def bulk():
+            cp.addMenus(menus)
+
+        results[size] = {}
+        for name, function in (("addMenu", single), ("addMenus", bulk)):
+            results[size][name] = measure(function, 1)
+            cpc.sourceGroup("System").RemGroup(wb)
+            cpc.forget("System." + wb)
+
+    report("Menu registration (ms)",
+           ["menus", "addMenu", "addMenus"],
+           [[s,
+             "%.1f" % results[s]["addMenu"],
+             "%.1f" % results[s]["addMenus"]] for s in sizes])
+    return results
+
+
+def moduleImports(name):
+    """Cube menu modules imported by the module at import time. Imports
+       inside functions and classes are loaded on first use and skipped."""
+    with open(os.path.join(path, name + ".py")) as f:
+        tree = ast.parse(f.read())
+    names = []
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            continue
+        elif isinstance(node, ast.Import):
+            names.extend(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+        else:
+            nodes.extend(ast.iter_child_nodes(node))
+    modules = set()
+    for n in names:
+        if os.path.exists(os.path.join(path, n + ".py")):
+            modules.add(n)
+    return modules
+
+
+def startupImports():
+    """Cube menu modules loaded by InitGui, directly or indirectly."""
+    loaded = set()
+    pending = moduleImports("InitGui")
+    while pending:
+        name = pending.pop()
+        if name not in loaded:
+            loaded.add(name)
+            pending |= moduleImports(name)
+    return loaded
+
+
+def benchImport(started=False):
+    """Check the startup import set stays minimal and report the import
+       time recorded at startup. Module level imports are checked, and
+       with started, called after the deferred start calls ran, the
+       loaded modules and that the start is marked ready before any
+       menu population."""
+    import CubeMenuCommon as cpc
+
+    loaded = startupImports()
+    extra = set(loaded - startupModules)
+    for name in list(sys.modules) if started else ():
+        if (name.startswith("CubeMenu") and name not in startupModules and
+                name not in ("CubeMenuBenchmark", "CubeMenuStubs")):
+            extra.add(name)
+    extra = sorted(extra)
+    times = cpc.startupTimes()
+    report("Startup import",
+           ["modules", "import (ms)", "ready (ms)"],
+           [[len(loaded), "%.1f" % ((times["import"] or 0) * 1000),
+             "%.1f" % ((times["ready"] or 0) * 1000)]])
+    assert not extra, "Modules loaded at startup: " + ", ".join(extra)
+    if started:
+        assert times["ready"] is not None, "Startup: not ready"
+        assert times["firstMenu"] is None, "Startup: menu populated"
+    return {"modules": sorted(loaded),
+            "import": times["import"],
+            "ready": times["ready"]}
+
+
+def benchXpm(n, size=64):
+    """Synthetic workbench XPM icon source."""
+    lines = ['"%d %d 2 1",' % (size, size),
+             '"  c None",',
+             '". c #%06X",' % ((n * 2654435761) & 0xFFFFFF)]
+    for y in range(size):
+        row = ""
+        for x in range(size):
+            row += "." if (x * y + n) % 7 else " "
+        lines.append('"' + row + '",')
+    return ("/* XPM */\nstatic char * icon_xpm[] = {\n" +
+            "\n".join(lines).rstrip(",") + "};\n")
+
+
+def benchIcons(count=40, repeat=5):
+    """Preferences dialog open time with and without the icon caches.
+       The workbench selector loads icons on the first open and when the
+       workbench list changed since the last open. The first open is
+       timed with empty memory cache, if the dialog was not open yet.
+       Reopens after a workbench list change are timed uncached, from
+       the disk cache and from the memory cache. They need the
+       CubeMenuStubs stand-ins, which add count workbenches with XPM
+       icons."""
+    import CubeMenuCommon as cpc
+    import CubeMenuIcons as cpi
+    import CubeMenuPreferences as cpp
+
+    stubs = sys.modules.get("CubeMenuStubs")
+    names = [prefix + "Icon" + str(n) + "Workbench" for n in range(count)]
+
+    def addWorkbench(n):
+        wb = stubs.addWorkbench(names[n], "Workbench " + str(n))
+        wb.Icon = benchXpm(n)
+
+    if stubs:
+        for n in range(count):
+            addWorkbench(n)
+    disk = cpc.p.GetBool("IconDiskCache", 1)
+    state = {"removed": False}
+
+    def openDialog():
+        cpp.showDialog()
+        QtGui.QApplication.processEvents()
+
+    def reopen(memory, diskCache):
+        """Best reopen time after a workbench list change."""
+        cpc.p.SetBool("IconDiskCache", diskCache)
+        best = None
+        for i in range(repeat):
+            cpp.instance.done(0)
+            # Alternate the list, so each open reloads the icons
+            if state["removed"]:
+                addWorkbench(0)
+            else:
+                stubs.removeWorkbench(names[0])
+            state["removed"] = not state["removed"]
+            if not memory:
+                cpi.clearCache()
+            elapsed = measure(openDialog, 1)
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    results = {"workbenches": len(Gui.listWorkbenches()), "first": None}
+    if cpp.instance is None:
+        cpi.clearCache()
+        results["first"] = measure(openDialog, 1)
+    else:
+        openDialog()
+    if stubs:
+        results["uncached"] = reopen(False, False)
+        results["disk"] = reopen(False, True)
+        results["cached"] = reopen(True, True)
+    cpc.p.SetBool("IconDiskCache", disk)
+    cpp.instance.done(0)
+    if stubs:
+        for name in names:
+            stubs.removeWorkbench(name)
+    # Catalog command icons don't evict the workbench icons
+    workbenchIcons = list(cpi.cache)
+    for n in range(cpi.cacheSize * 2):
+        cpi.keyIcon(cpi.sourceKey(prefix + str(n)))
+    assert list(cpi.cache) == workbenchIcons, "Icons: workbench evicted"
+    results["stats"] = cpi.cacheStats()
+
+    def cell(key):
+        return "n/a" if results.get(key) is None else "%.2f" % results[key]
+
+    report("Preferences dialog open with workbench icons (ms)",
+           ["workbenches", "first", "uncached", "disk", "cached"],
+           [[results["workbenches"]] +
+            [cell(k) for k in ("first", "uncached", "disk", "cached")]])
+    return results
+
+
+def benchSearch(sizes=(1000, 5000, 20000), repeat=20):
+    """Cost of command search queries by number of commands, and of a
+       source model reset without a query, as on a workbench switch."""
+    import CubeMenuModels as cpm
+
+    queries = ["42", "bench 42", prefix.lower() + "_42", "bnech 42"]
+    results = {}
+    for size in sizes:
+        created = benchActions(size)
+        source = cpm.CommandModel()
+        source.refresh()
+        model = cpm.SearchModel(source)
+        entries = dict((n, [source.text(n), source.toolTip(n), None])
+                       for n in source.names)
+        state = {"flip": False}
+
+        def reset():
+            state["flip"] = not state["flip"]
+            if state["flip"]:
+                source.refresh(entries, prefix)
+            else:
+                source.refresh()
+
+        results[size] = {"commands": source.rowCount(),
+                         "reset": measure(reset, repeat)}
+        for query in queries:
+
+            def search():
+                model.setQuery("")
+                model.setQuery(query)
+
+            results[size][query] = (measure(search, repeat),
+                                    model.rowCount())
+        for a in created:
+            a.deleteLater()
+        QtCore.QCoreApplication.sendPostedEvents(None,
+                                                 QtCore.QEvent.DeferredDelete)
+
+    report("Search (ms/results)",
+           ["commands", "reset"] + queries,
+           [[results[s]["commands"], "%.3f" % results[s]["reset"]] +
+            ["%.3f/%d" % results[s][q] for q in queries] for s in sizes])
+    return results
+
+
+def benchFuzzy(repeat=20):
+    """Misspelled queries, checked to rank the intended command first.
+       Raises AssertionError otherwise."""
+    import CubeMenuModels as cpm
+
+    commands = (("Front", "Front"),
+                ("FrontBack", "Front and back"),
+                ("Font", "Font settings"),
+                ("NewSketch", "Create sketch"),
+                ("Box", "Cube"),
+                ("Cut", "Cut"))
+    expected = (("fornt", "Front"),
+                ("skecth", "Create sketch"),
+                ("cueb", "Cube"),
+                ("bnech 42", prefix + " 42"))
+    created = benchActions(100)
+    for name, text in commands:
+        a = QtGui.QAction(mw)
+        a.setObjectName("Bench_" + name)
+        a.setText(text)
+        created.append(a)
+    source = cpm.CommandModel()
+    source.refresh()
+    model = cpm.SearchModel(source)
+    results = {}
+    for query, text in expected:
+
+        def search():
+            model.setQuery("")
+            model.setQuery(query)
+
+        elapsed = measure(search, repeat)
+        first = model.index(0).data() if model.rowCount() else None
+        assert first == text, "%s: %s, not %s" % (query, first, text)
+        results[query] = elapsed
+    for a in created:
+        a.deleteLater()
+    QtCore.QCoreApplication.sendPostedEvents(None,
+                                             QtCore.QEvent.DeferredDelete)
+
+    report("Fuzzy search (ms)",
+           [q for q, t in expected],
+           [["%.3f" % results[q] for q, t in expected]])
+    return results
+
+
+def benchEditMenu(repeat=5):
+    """Add menu followed by Edit menu in the preferences dialog. Raises
+       AssertionError if a slot raised or the menu page is not shown."""
+    import CubeMenuPreferences as cpp
+
+    errors = []
+    hook = sys.excepthook
+
+    def record(kind, value, traceback):
+        errors.append(value)
+        hook(kind, value, traceback)
+
+    cpp.showDialog()
+    QtGui.QApplication.processEvents()
+    buttons = {}
+    for b in cpp.instance.findChildren(QtGui.QPushButton):
+        buttons[b.toolTip()] = b
+    stack = cpp.instance.findChild(QtGui.QStackedWidget)
+    commands = cpp.enabledModel.commands()
+
+    def addEdit():
+        stack.setCurrentIndex(0)
+        buttons["Add menu"].click()
+        buttons["Edit menu"].click()
+        QtGui.QApplication.processEvents()
+
+    sys.excepthook = record
+    try:
+        elapsed = measure(addEdit, repeat)
+    finally:
+        sys.excepthook = hook
+        stack.setCurrentIndex(0)
+        cpp.enabledModel.setCommands(commands)
+        cpp.saveEnabled()
+        cpp.instance.done(0)
+    assert not errors, "Edit menu: " + repr(errors[0] if errors else None)
+    report("Add and edit menu (ms)", ["open"], [["%.3f" % elapsed]])
+    return {"open": elapsed}
+
+
+def benchPreset(repeat=20):
+    """Apply a NaviCube style preset. Raises AssertionError if values or
+       settings options are not written, or if an invalid preset writes
+       anything."""
+    import CubeMenuPreferences as cpp
+
+    preset = {"CubeSize": 150, "FontWeight": 50, "FrontColor": 0xFF00FF,
+              "TextFront": "F", "ShowCS": True}
+    elapsed = measure(lambda: cpp.applyPreset(preset), repeat)
+    assert cpp.pCube.GetInt("CubeSize") == 150, "Preset: CubeSize"
+    assert cpp.p.GetBool("EnableSize"), "Preset: EnableSize"
+    assert cpp.p.GetBool("EnableTextFront"), "Preset: EnableTextFront"
+    for invalid in ({"CubeSize": 0}, {"FontWeight": 100},
+                    {"FrontColor": -1}, {"OffsetX": "1"},
+                    {"TextFront": 1}, {"CubeSize": True},
+                    {"CubeSize": 300, "FontStretch": 1001}):
+        try:
+            cpp.applyPreset(invalid)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Preset: accepted " + repr(invalid))
+    assert cpp.pCube.GetInt("CubeSize") == 150, "Preset: partial write"
+    cpp.applyPreset(dict.fromkeys(preset))
+    assert not cpp.p.GetBool("EnableSize"), "Preset: EnableSize reset"
+    report("Apply preset (ms)", ["apply"], [["%.3f" % elapsed]])
+    return {"apply": elapsed}
+
+
+def benchDialog(repeat=10):
+    """Open latency of the preferences dialog, first and later opens."""
+    import CubeMenuPreferences as cpp
+
+    def openDialog():
+        cpp.showDialog()
+        QtGui.QApplication.processEvents()
+
+    def openClose():
+        openDialog()
+        cpp.instance.done(0)
+
+    first = None
+    if cpp.instance is None:
+        first = measure(openDialog, 1)
+        cpp.instance.done(0)
+    later = measure(openClose, repeat)
+
+    report("Preferences dialog open (ms)",
+           ["first", "later"],
+           [["n/a" if first is None else "%.3f" % first, "%.3f" % later]])
+    return {"first": first, "later": later}
+
+
+def benchHeadless(scales=(100, 1000, 10000), repeat=10, output=None):
+    """Core operations by number of commands and menus. Results are
+       returned and written as JSON to the output file, if given."""
+    import CubeMenu as cp
+    import CubeMenuCommon as cpc
+    import CubeMenuToolbars as cpt
+
+    wb = prefix + "Workbench"
+    top = Gui.activeWorkbench().__class__.__name__
+    results = {}
+    for size in scales:
+        created = benchActions(size)
+        commands = []
+        for i, a in enumerate(created):
+            commands.append(a.objectName())
+            if i % 10 == 9:
+                commands.append("CPSeparator")
+        result = results[size] = {}
+
+        # Action registry, scan of the new actions and one new action
+        def rescan():
+            for a in created:
+                a.setParent(None)
+            cpc.actionList()
+            for a in created:
+                a.setParent(mw)
+
+        scans = []
+        for i in range(repeat):
+            if i:
+                rescan()
+            scans.append(measure(cpc.actionList, 1))
+        result["actionListScan"] = min(scans)
+
+        def actionChange():
+            a = QtGui.QAction(mw)
+            a.setObjectName(prefix + "_new")
+            a.setText(prefix + " new")
+            cpc.actionList()
+            a.setParent(None)
+
+        result["actionListChange"] = measure(actionChange, repeat)
+
+        # Menu groups
+        domains = cp.addMenus([{"workbench": wb,
+                                "uuid": prefix + str(i),
+                                "name": "Menu " + str(i),
+                                "commands": commands[:10]}
+                               for i in range(size)])
+
+        def findAll():
+            for domain in domains:
+                cpc.findGroup(domain)
+
+        result["findGroup"] = measure(findAll, repeat) / size
+        new = []
+
+        def newOne():
+            uid = prefix + "New" + str(len(new))
+            new.append(cpc.newGroup(".".join(["CPMenu", "System", wb, uid])))
+
+        result["newGroup"] = measure(newOne, repeat)
+
+        # Top menu and submenu with all commands
+        sub = cp.addMenus([{"workbench": top,
+                            "uuid": prefix + "Top",
+                            "name": "Top",
+                            "default": True,
+                            "commands": commands}])[0]
+
+        def populateTop():
+            cpcmd.invalidate()
+            cpcmd.populateTop()
+
+        def populateSub():
+            cpcmd.invalidate()
+            cpcmd.populateSub(sub)
+
+        def populateSubUnchanged():
+            cpcmd.populateSub(sub)
+
+        result["populateTop"] = measure(populateTop, repeat)
+        result["populateTopUnchanged"] = measure(cpcmd.populateTop, repeat)
+        result["populateSub"] = measure(populateSub, repeat)
+        result["populateSubUnchanged"] = measure(populateSubUnchanged,
+                                                 repeat)
+
+        # Toolbar with all commands
+        tb = QtGui.QToolBar(mw)
+        tb.setObjectName(prefix + "Toolbar")
+        tb.addActions(created)
+
+        def toolbarCommands():
+            cpt.toolbarCommands(tb.objectName())
+
+        result["toolbarCommands"] = measure(toolbarCommands, repeat)
+        tb.deleteLater()
+
+        # Preferences dialog
+        dialog = benchDialog(repeat)
+        result["dialogFirst"] = dialog["first"]
+        result["dialogLater"] = dialog["later"]
+
+        for source, workbench in (("System", wb), ("System", top)):
+            cpc.sourceGroup(source).RemGroup(workbench)
+            cpc.forget(source + "." + workbench)
+        cpcmd.invalidate()
+        for a in created:
+            a.deleteLater()
+        QtCore.QCoreApplication.sendPostedEvents(None,
+                                                 QtCore.QEvent.DeferredDelete)
+
+    columns = ["actionListScan", "actionListChange", "findGroup",
+               "newGroup", "populateTop", "populateSub", "toolbarCommands",
+               "dialogLater"]
+    report("Headless (ms)",
+           ["commands"] + columns,
+           [[s] + ["%.3f" % results[s][c] for c in columns] for s in scales])
+
+    data = {"format": 1,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "qt": QtCore.qVersion(),
+            "platform": sys.platform,
+            "freecad": ".".join(App.Version()[:2]),
+            "stubs": "CubeMenuStubs" in sys.modules,
+            "repeat": repeat,
+            "results": dict((str(s), results[s]) for s in scales)}
+    if output:
+        with open(output, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    return data
+
+
+def benchGenerated(workbenches=20, menus=50, commands=40, seed=1,
+                   repeat=10):
+    """Generated configuration: generation, lookup of all menus and
+       population of the menus of one workbench, cold and unchanged."""
+    import CubeMenuCommon as cpc
+    import CubeMenuGenerator as cpg
+
+    start = timeit.default_timer()
+    config = cpg.generate(workbenches, menus, commands, seed)
+    result = {"generate": (timeit.default_timer() - start) * 1000}
+    domains = []
+    for wb in config["workbenches"]:
+        domains.extend(config["domains"][wb])
+
+    def findAll():
+        for domain in domains:
+            cpc.findGroup(domain)
+
+    sample = config["domains"][config["workbenches"][0]]
+
+    def populateAll():
+        for domain in sample:
+            cpcmd.populateSub(domain)
+
+    def populateAllCold():
+        cpcmd.invalidate()
+        populateAll()
+
+    result["findGroup"] = measure(findAll, repeat) / len(domains)
+    result["populateSub"] = measure(populateAllCold, repeat) / len(sample)
+    result["populateSubUnchanged"] = (measure(populateAll, repeat) /
+                                      len(sample))
+    cpg.remove(config)
+    cpcmd.invalidate()
+    QtCore.QCoreApplication.sendPostedEvents(None,
+                                             QtCore.QEvent.DeferredDelete)
+
+    size = "%dx%dx%d" % (len(config["workbenches"]), menus, commands)
+    report("Generated configuration (ms)",
+           ["size", "generate", "findGroup", "populate", "unchanged"],
+           [[size,
+             "%.1f" % result["generate"],
+             "%.4f" % result["findGroup"],
+             "%.3f" % result["populateSub"],
+             "%.4f" % result["populateSubUnchanged"]]])
+    result["size"] = size
+    result["seed"] = seed
+    return result
+
+
+def median(values):
+    """Median of the values."""
+    values = sorted(values)
+    n = len(values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def metricOrder(key):
+    """Sort key of scale/metric keys, by scale and metric."""
+    scale, metric = key.split("/")
+    return int(scale), metric
+
+
+def samples(scales, runs, repeat):
+    """Gate metrics of repeated headless runs, as lists keyed by
+       scale/metric."""
+    result = {}
+    quiet["on"] = True
+    try:
+        for run in range(runs):
+            data = benchHeadless(scales, repeat)
+            for s in scales:
+                for m in gateMetrics:
+                    key = "%d/%s" % (s, m)
+                    value = data["results"][str(s)][m]
+                    result.setdefault(key, []).append(value)
+    finally:
+        quiet["on"] = False
+    return result
+
+
+def writeBaseline(output=baselinePath, scales=(100, 1000), runs=5,
+                  repeat=10):
+    """Store the median and the median absolute deviation of the gate
+       metrics as the baseline."""
+    metrics = {}
+    for key, values in samples(scales, runs, repeat).items():
+        m = median(values)
+        metrics[key] = {"median": m,
+                        "mad": median([abs(v - m) for v in values])}
+    data = {"format": 1,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "qt": QtCore.qVersion(),
+            "platform": sys.platform,
+            "stubs": "CubeMenuStubs" in sys.modules,
+            "scales": list(scales),
+            "runs": runs,
+            "repeat": repeat,
+            "metrics": metrics}
+    directory = os.path.dirname(output)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(output, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return data
+
+
+def compare(baseline=baselinePath, runs=None, tolerance=0.25, floor=0.05):
+    """Compare the median of new runs with the baseline. A metric
+       regresses above the baseline median plus the relative tolerance
+       and the larger of floor milliseconds and three median absolute
+       deviations. Returns the regressed metrics."""
+    with open(baseline) as f:
+        base = json.load(f)
+    current = samples(base["scales"], runs or base["runs"], base["repeat"])
+    rows = []
+    regressions = []
+    for key in sorted(base["metrics"], key=metricOrder):
+        b = base["metrics"][key]
+        if key not in current:
+            continue
+        m = median(current[key])
+        noise = max(floor, 3 * b["mad"])
+        limit = b["median"] * (1 + tolerance) + noise
+        if m > limit:
+            status = "REGRESSION"
+            regressions.append(key)
+        elif m < b["median"] * (1 - tolerance) - noise:
+            status = "improved"
+        else:
+            status = "ok"
+        change = (m / b["median"] - 1) * 100 if b["median"] else 0.0
+        rows.append([key, "%.3f" % b["median"], "%.3f" % m, "%.3f" % limit,
+                     "%+.0f%%" % change, status])
+
+    report("Baseline comparison (ms), %s" % baseline,
+           ["metric".ljust(30), "baseline", "median", "limit", "change",
+            "status"],
+           [[r[0].ljust(30)] + r[1:] for r in rows])
+    App.Console.PrintMessage("%d regressions, %d metrics\n" %
+                             (len(regressions), len(rows)))
+    return regressions
+
+
+def main():
+    """Run the headless benchmarks from the command line."""
+    import argparse
+    import CubeMenuGui
+    import CubeMenuGlobalDefinitions
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scales",
+                        help="comma separated numbers of commands")
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="repetitions, the best time is reported")
+    parser.add_argument("--config", default="20x50x40",
+                        help="generated workbenches x menus x commands")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="generated configuration seed")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--baseline", nargs="?", const=baselinePath,
+                        help="compare with the baseline JSON, exit with "
+                        "status 1 on regressions")
+    parser.add_argument("--update", action="store_true",
+                        help="write the baseline instead of comparing, to "
+                        "the default baseline without --baseline")
+    parser.add_argument("--runs", type=int,
+                        help="baseline runs, the median is compared")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown")
+    args = parser.parse_args()
+    if args.update and not args.baseline:
+        args.baseline = baselinePath
+    # Check the loaded modules once the deferred start calls have run
+    end = time.time() + CubeMenuGui.recordDelay / 1000.0 + 0.2
+    while time.time() < end:
+        QtGui.QApplication.processEvents()
+        time.sleep(0.01)
+    benchImport(True)
+
+    if args.baseline:
+        if args.update:
+            scales = [int(s) for s in (args.scales or "100,1000").split(",")]
+            writeBaseline(args.baseline, scales, args.runs or 5, args.repeat)
+            print("Baseline written to " + args.baseline)
+            return 0
+        if compare(args.baseline, args.runs, args.tolerance):
+            return 1
+        return 0
+
+    scales = [int(s) for s in (args.scales or "100,1000,10000").split(",")]
+    data = benchHeadless(scales, args.repeat)
+    data["registry"] = benchRegistry()
+    data["mirror"] = benchMirror()
+    data["compile"] = benchCompile(args.repeat)
+    data["diagnostics"] = benchDiagnostics(args.repeat)
+    data["fuzzy"] = benchFuzzy(args.repeat)
+    data["icons"] = benchIcons(repeat=args.repeat)
+    data["editMenu"] = benchEditMenu()
+    data["preset"] = benchPreset(args.repeat)
+    if args.config:
+        w, m, c = [int(n) for n in args.config.split("x")]
+        data["generated"] = benchGenerated(w, m, c, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    if not args.output:
+        print(json.dumps(data, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+"""Cube menu for FreeCAD - Command catalog.
+
+Commands of each workbench are recorded when the workbench is active
+and stored in <UserAppData>/CubeMenu/Catalog.json. The preferences use
+the catalog to edit menus of workbenches that are not active. The
+catalog is discarded when the FreeCAD version or the catalog format
+changes, workbench entries when the version or the file of the Mod
+defining the workbench changes."""
+
+
+import os
+import re
+import sys
+import json
+from PySide import QtCore
+import FreeCAD as App
+import FreeCADGui as Gui
+import CubeMenuCommon as cpc
+import CubeMenuIcons as cpi
+
+
+mw = Gui.getMainWindow()
+formatVersion = 1
+catalog = {"data": None, "revision": 0}
+pending = []
+timers = {}
+
+
+def freecadVersion():
+    """FreeCAD version string."""
+    return ".".join(str(v) for v in App.Version()[:3])
+
+
+def emptyCatalog():
+    """New catalog for the running FreeCAD version."""
+    return {"format": formatVersion,
+            "freecad": freecadVersion(),
+            "commands": {},
+            "workbenches": {}}
+
+
+def load():
+    """Catalog data, read from disk on first use."""
+    if catalog["data"] is None:
+        data = None
+        try:
+            with open(cpc.catalogPath()) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+        if (not isinstance(data, dict) or
+                data.get("format") != formatVersion or
+                data.get("freecad") != freecadVersion()):
+            data = emptyCatalog()
+        catalog["data"] = data
+    return catalog["data"]
+
+
+def save():
+    """Write the catalog to disk."""
+    data = load()
+    name = cpc.catalogPath()
+    temp = name + ".tmp"
+    try:
+        if not os.path.isdir(os.path.dirname(name)):
+            os.makedirs(os.path.dirname(name))
+        with open(temp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        if os.path.exists(name):
+            os.remove(name)
+        os.rename(temp, name)
+    except (IOError, OSError):
+        pass
+
+
+def timer(name, interval, function):
+    """Single shot timer, created on first use."""
+    if name not in timers:
+        t = QtCore.QTimer(mw)
+        t.setSingleShot(True)
+        t.setInterval(interval)
+        t.timeout.connect(function)
+        timers[name] = t
+    return timers[name]
+
+
+def flush():
+    """Write pending changes now."""
+    t = timers.get("save")
+    if t and t.isActive():
+        t.stop()
+        save()
+
+
+def workbenchFile(wb):
+    """File defining the workbench class. Workbenches defined in InitGui.py
+       of a Mod directory belong to __main__, their file is taken from
+       the code of the class methods or found in the Mod directories."""
+    for value in vars(wb.__class__).values():
+        code = getattr(value, "__code__", None)
+        if code and os.path.isfile(code.co_filename):
+            return code.co_filename
+    module = sys.modules.get(wb.__class__.__module__)
+    name = getattr(module, "__file__", None)
+    if module and module.__name__ != "__main__" and name:
+        return name
+    bases = [os.path.join(App.getUserAppDataDir(), "Mod")]
+    if hasattr(App, "getHomePath"):
+        bases.append(os.path.join(App.getHomePath(), "Mod"))
+    pattern = re.compile(r"^class\s+" + wb.__class__.__name__ + r"\b", re.M)
+    for base in bases:
+        try:
+            mods = sorted(os.listdir(base))
+        except OSError:
+            continue
+        for mod in mods:
+            name = os.path.join(base, mod, "InitGui.py")
+            try:
+                with open(name) as f:
+                    if pattern.search(f.read()):
+                        return name
+            except (IOError, OSError, UnicodeDecodeError):
+                pass
+    return None
+
+
+def packageVersion(directory):
+    """Version from package.xml in the directory or its parent."""
+    for d in (directory, os.path.dirname(directory)):
+        try:
+            with open(os.path.join(d, "package.xml")) as f:
+                found = re.search(r"<version>\s*([^<]*?)\s*</version>",
+                                  f.read())
+        except (IOError, OSError, UnicodeDecodeError):
+            continue
+        if found:
+            return found.group(1)
+    return ""
+
+
+def workbenchStamp(workbench):
+    """Stamp of the Mod defining the workbench, the package.xml version
+       and the modification time of the defining file. Empty if the
+       workbench is not found or has no file."""
+    for wb in Gui.listWorkbenches().values():
+        if wb.__class__.__name__ == workbench:
+            name = workbenchFile(wb)
+            if name:
+                try:
+                    return (packageVersion(os.path.dirname(name)) + ":" +
+                            repr(os.path.getmtime(name)))
+                except OSError:
+                    pass
+            break
+    return ""
+
+
+def schedule():
+    """Record the active workbench once activation settles."""
+    timer("record", 500, record).start()
+
+
+def record():
+    """Record commands of the active workbench. Text and tooltip are
+       stored right away, icons are stored in the icon disk cache in
+       idle time."""
+    workbench = Gui.activeWorkbench().__class__.__name__
+    data = load()
+    commands = data["commands"]
+    actions = cpc.actionList()
+    changed = False
+    for name in actions:
+        text = actions[name].text().replace("&", "")
+        tip = actions[name].toolTip()
+        entry = commands.get(name)
+        if not entry or entry[0] != text or entry[1] != tip:
+            commands[name] = [text, tip, entry[2] if entry else ""]
+            pending.append(name)
+            changed = True
+        elif not entry[2]:
+            pending.append(name)
+    names = sorted(actions)
+    stamp = workbenchStamp(workbench)
+    entry = data["workbenches"].get(workbench)
+    if not entry or entry["commands"] != names or entry["stamp"] != stamp:
+        data["workbenches"][workbench] = {"stamp": stamp, "commands": names}
+        changed = True
+    if changed:
+        catalog["revision"] += 1
+        timer("save", 2000, save).start()
+    if pending:
+        timer("icons", 0, recordIcons).start()
+
+
+def recordIcons():
+    """Store icons of pending commands, a few per event loop pass."""
+    commands = load()["commands"]
+    for i in range(50):
+        if not pending:
+            break
+        name = pending.pop()
+        action = cpc.findAction(name)
+        if action and name in commands:
+            key = cpi.iconKey(action.icon())
+            if key != commands[name][2]:
+                commands[name][2] = key
+                timer("save", 2000, save).start()
+    if pending:
+        timers["icons"].start()
+
+
+def revision():
+    """Counter incremented on every catalog change."""
+    return catalog["revision"]
+
+
+def commands(workbench):
+    """Dictionary of command name and [text, tooltip, icon key] for the
+       workbench, None if not recorded or the workbench changed."""
+    data = load()
+    entry = data["workbenches"].get(workbench)
+    if not entry or entry["stamp"] != workbenchStamp(workbench):
+        return None
+    result = {}
+    for name in entry["commands"]:
+        if name in data["commands"]:
+            result[name] = data["commands"][name]
+    return result
+
+
+def command(name):
+    """Catalog entry [text, tooltip, icon key] of a command or None."""
+    return load()["commands"].get(name)
+
+
+if hasattr(mw, "mainWindowClosed"):
+    mw.mainWindowClosed.connect(flush)
@@ -21,6 +21,9 @@
 """Cube menu for FreeCAD - Commands."""
 
 
+import time
+import difflib
+from collections import OrderedDict
 from PySide import QtGui
 from PySide import QtCore
 import FreeCADGui as Gui
@@ -28,9 +31,14 @@ import CubeMenuCommon as cpc
 
 
 p = cpc.p
-menuActions = []
+menuActions = OrderedDict()
+lastUsed = {}
 mw = Gui.getMainWindow()
 mapperShow = QtCore.QSignalMapper()
+compiled = {}
+resolved = {}
+state = {"revision": None, "generation": None, "global": False}
+stats = {"created": 0, "evicted": 0, "peak": 0}
 
 
 def populateMenu(domain=None):
@@ -41,52 +49,126 @@ def populateMenu(domain=None):
         populateTop()
 
 
-def populateTop():
-    """Populate all top menus."""
+def refreshState():
+    """Drop cached parameter data on parameter revision change."""
+    rev = cpc.paramRevision()
+    if state["revision"] != rev:
+        state["revision"] = rev
+        state["global"] = p.GetBool("Global", 0)
+        resolved.clear()
+        compiled.clear()
+    return rev
+
+
+def topWorkbench():
+    """Workbench providing the top menu."""
+    refreshState()
     # Global menu mode
-    if p.GetBool("Global", 0):
+    if state["global"]:
         workbench = "GlobalPanel"
     else:
         workbench = Gui.activeWorkbench().__class__.__name__
+    return workbench
 
-    for menu in mw.findChildren(QtGui.QMenu, "NaviCube_Menu"):
-        commands = []
+
+def defaultDomain(workbench):
+    """Resolve default menu domain for the workbench."""
+    refreshState()
+    if workbench not in resolved:
         # User
-        if p.GetGroup("User").GetGroup(workbench).GetString("default"):
-            domain = (p.GetGroup("User")
-                      .GetGroup(workbench)
+        if cpc.workbenchGroup("User", workbench).GetString("default"):
+            domain = (cpc.workbenchGroup("User", workbench)
                       .GetString("default"))
         # System
-        elif p.GetGroup("System").GetGroup(workbench).GetString("default"):
-            domain = (p.GetGroup("System")
-                      .GetGroup(workbench)
+        elif cpc.workbenchGroup("System", workbench).GetString("default"):
+            domain = (cpc.workbenchGroup("System", workbench)
                       .GetString("default"))
         # Global default
         else:
             domain = "CPMenu.System.GlobalPanel.GlobalDefault"
+        resolved[workbench] = domain
+    return resolved[workbench]
 
-        group = cpc.findGroup(domain)
 
+def compileMenu(workbench, domain):
+    """Return cache key and commands for the menu. Compiled menus are
+       keyed by workbench, domain, parameter revision and action
+       registry generation, and dropped when either changes."""
+    generation = cpc.actionGeneration()
+    if state["generation"] != generation:
+        state["generation"] = generation
+        compiled.clear()
+    key = (workbench, domain, refreshState(), generation)
+    if key not in compiled:
+        commands = []
+        group = cpc.findGroup(domain)
         if group:
             commands = cpc.splitIndex(group, "commands")
             commands = globalDefault(commands)
+        compiled[key] = commands
+    return str(key), compiled[key]
 
-        addActions(menu, commands)
 
+def invalidate(workbench=None):
+    """Drop compiled menus for the workbench, or all compiled menus, and
+       force menus to repopulate on next show."""
+    for key in list(compiled):
+        if not workbench or key[0] == workbench:
+            del compiled[key]
+    if workbench:
+        resolved.pop(workbench, None)
+    else:
+        resolved.clear()
+    for menu in mw.findChildren(QtGui.QMenu, "NaviCube_Menu"):
+        menu.setProperty("CubeMenuKey", None)
+    for act in menuActions.values():
+        act.menu().setProperty("CubeMenuKey", None)
 
+
+def onWorkbenchActivated(name):
+    """Invalidate compiled menus of the activated workbench and index
+       actions of its new toolbars."""
+    cpc.rescanActions()
+    invalidate(Gui.activeWorkbench().__class__.__name__)
+
+
+@cpc.timed("populateTop")
+def populateTop():
+    """Populate all top menus."""
+    workbench = topWorkbench()
+    domain = defaultDomain(workbench)
+    key, commands = compileMenu(workbench, domain)
+    start = time.time()
+    changed = False
+
+    for menu in mw.findChildren(QtGui.QMenu, "NaviCube_Menu"):
+        if menu.property("CubeMenuKey") != key:
+            addActions(menu, commands)
+            menu.setProperty("CubeMenuKey", key)
+            changed = True
+
+    if changed:
+        collect(start, True)
+
+
+@cpc.profiled("submenu")
+@cpc.timed("populateSub")
 def populateSub(domain):
     """Populate submenu."""
-    action = menuAction(domain)
+    action = menuActions.get(domain)
+    if action:
+        touch(domain)
+    else:
+        action = menuAction(domain)
 
     if action:
-        commands = []
         menu = action.menu()
-        group = cpc.findGroup(domain)
-        if group:
-            commands = cpc.splitIndex(group, "commands")
-            commands = globalDefault(commands)
-
-        addActions(menu, commands)
+        key, commands = compileMenu(None, domain)
+        if menu.property("CubeMenuKey") != key:
+            start = time.time()
+            addActions(menu, commands)
+            menu.setProperty("CubeMenuKey", key)
+            collect(start)
 
 
 def menuAction(domain):
@@ -95,45 +177,148 @@ def menuAction(domain):
     group = cpc.findGroup(domain)
 
     if group:
-        for act in menuActions:
-            if act.menu().objectName() == domain:
-                action = act
+        action = menuActions.get(domain)
         if not action:
             action = QtGui.QAction(mw)
             menu = QtGui.QMenu()
             menu.setObjectName(domain)
             action.setMenu(menu)
-            menuActions.append(action)
+            menuActions[domain] = action
             mapperShow.setMapping(menu, domain)
             menu.aboutToShow.connect(mapperShow.map)
+            stats["created"] += 1
+            stats["peak"] = max(stats["peak"], len(menuActions))
+        touch(domain)
         action.setText(group.GetString("name"))
 
     return action
 
 
+def touch(domain):
+    """Mark submenu as recently used."""
+    menuActions[domain] = menuActions.pop(domain)
+    lastUsed[domain] = time.time()
+
+
+def evict(domain):
+    """Release submenu and its action."""
+    action = menuActions.pop(domain)
+    lastUsed.pop(domain, None)
+    menu = action.menu()
+    mapperShow.removeMappings(menu)
+    action.deleteLater()
+    menu.deleteLater()
+    stats["evicted"] += 1
+
+
+def collect(since=None, check=False):
+    """Evict submenus over the cap (SubmenuCache parameter), submenus not
+       used for SubmenuIdle seconds and, if check is set, submenus with a
+       deleted domain. Visible submenus and submenus used after since are
+       kept, the cap is a soft limit. Menus that contained an evicted
+       submenu are repopulated on next show."""
+    cap = p.GetInt("SubmenuCache", 256)
+    idle = p.GetInt("SubmenuIdle", 3600)
+    now = time.time()
+    evicted = False
+    # Least recently used first
+    for domain in list(menuActions):
+        if (menuActions[domain].menu().isVisible() or
+                (since and lastUsed[domain] >= since)):
+            continue
+        if (len(menuActions) > cap or
+                (idle and now - lastUsed[domain] > idle) or
+                (check and not cpc.findGroup(domain))):
+            evict(domain)
+            evicted = True
+    if evicted:
+        for menu in mw.findChildren(QtGui.QMenu, "NaviCube_Menu"):
+            menu.setProperty("CubeMenuKey", None)
+        for act in menuActions.values():
+            act.menu().setProperty("CubeMenuKey", None)
+
+
+def submenuStats():
+    """Return submenu cache counters."""
+    return {"cached": len(menuActions),
+            "created": stats["created"],
+            "evicted": stats["evicted"],
+            "peak": stats["peak"],
+            "cap": p.GetInt("SubmenuCache", 256)}
+
+
+@cpc.timed("addActions")
 def addActions(menu, commands):
     """Add actions to menu."""
     actions = cpc.actionList()
+    separators = []
+    for act in reversed(menu.actions()):
+        if act.isSeparator():
+            separators.append(act)
 
-    # Empty menu
-    for act in menu.actions():
-        menu.removeAction(act)
-
-    # Add actions
+    target = []
     for cmd in commands:
         if cmd == "CPSeparator":
-            menu.addSeparator()
+            if separators:
+                target.append(separators.pop())
+            else:
+                sep = QtGui.QAction(menu)
+                sep.setSeparator(True)
+                target.append(sep)
         elif cmd == "CPMenu":
             pass
         elif cmd.startswith("CPMenu"):
             ma = menuAction(cmd)
             if ma:
-                menu.addAction(ma)
+                target.append(ma)
         elif cmd in actions:
-            menu.addAction(actions[cmd])
+            target.append(actions[cmd])
         else:
             pass
 
+    # Adding an action twice moves it, keep the last occurrence
+    temp = []
+    seen = set()
+    for act in reversed(target):
+        if act not in seen:
+            seen.add(act)
+            temp.append(act)
+    temp.reverse()
+
+    updateMenu(menu, temp)
+
+
+def updateMenu(menu, target):
+    """Apply minimal edit script, transforming menu actions to target."""
+    current = menu.actions()
+    if current == target:
+        return
+
+    keep = set(target)
+    matcher = difflib.SequenceMatcher(None,
+                                      [id(a) for a in current],
+                                      [id(a) for a in target],
+                                      autojunk=False)
+    menu.setUpdatesEnabled(False)
+    try:
+        # Reversed, to keep the indexes of current valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            for act in current[i1:i2]:
+                if act not in keep:
+                    menu.removeAction(act)
+                    if act.isSeparator() and act.parent() is menu:
+                        act.deleteLater()
+            if i2 < len(current):
+                for act in target[j1:j2]:
+                    menu.insertAction(current[i2], act)
+            else:
+                for act in target[j1:j2]:
+                    menu.addAction(act)
+    finally:
+        menu.setUpdatesEnabled(True)
+
 
 def globalDefault(commands):
     """Add commands from global default menu."""
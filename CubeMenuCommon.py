@@ -21,58 +21,648 @@
 """Cube menu for FreeCAD - Common."""
 
 
+import time
+startup = {"importStart": time.time()}
+
+
+import os
 import uuid
+import bisect
+import functools
+from collections import deque
 import FreeCADGui as Gui
 import FreeCAD as App
 from PySide import QtGui
+from PySide import QtCore
 
 
 mw = Gui.getMainWindow()
 p = App.ParamGet("User parameter:BaseApp/CubeMenu")
+revision = 0
+observed = {}
+mirror = {}
+clock = getattr(time, "perf_counter", time.time)
+profile = p.GetGroup("Profile")
+profileState = {"count": profile.GetInt("Count", 0)}
+diagGroup = p.GetGroup("Diagnostics")
+diag = {"enabled": diagGroup.GetBool("Enabled", 0), "timers": {}}
+# Histogram bucket upper bounds in milliseconds and recent calls kept
+diagBounds = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+diagRecent = 32
+
+
+def timed(name):
+    """Decorator recording call durations under the name, while the
+       diagnostics are enabled. Disabled, the cost is one lookup."""
+
+    def decorate(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not diag["enabled"]:
+                return function(*args, **kwargs)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, (clock() - start) * 1000)
+
+        return wrapper
+
+    return decorate
+
+
+class ProfileObserver(object):
+    """Profile group observer. Keeps the requested capture count, without
+       changing the parameter revision."""
+
+    def OnChange(self, grp, reason):
+        """Read the capture count."""
+        profileState["count"] = grp.GetInt("Count", 0)
+
+
+def profiled(name):
+    """Decorator capturing the call with CubeMenuProfile, while captures
+       are requested by the Count parameter of the Profile group.
+       Without captures, the cost is one lookup."""
+
+    def decorate(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if profileState["count"] < 1:
+                return function(*args, **kwargs)
+            import CubeMenuProfile as cpprof
+            return cpprof.capture(name, function, *args, **kwargs)
+
+        return wrapper
 
+    return decorate
 
+
+def record(name, ms):
+    """Add call duration in milliseconds to the histogram and the ring
+       buffer of recent calls."""
+    timer = diag["timers"].get(name)
+    if timer is None:
+        timer = {"count": 0,
+                 "total": 0.0,
+                 "max": 0.0,
+                 "histogram": [0] * (len(diagBounds) + 1),
+                 "recent": deque(maxlen=diagRecent)}
+        diag["timers"][name] = timer
+    timer["count"] += 1
+    timer["total"] += ms
+    if ms > timer["max"]:
+        timer["max"] = ms
+    timer["histogram"][bisect.bisect_left(diagBounds, ms)] += 1
+    timer["recent"].append((time.time(), ms))
+
+
+def setDiagnostics(enabled):
+    """Enable or disable recording, kept in the Diagnostics group. The
+       group is not observed, the parameter revision is not changed."""
+    diag["enabled"] = bool(enabled)
+    diagGroup.SetBool("Enabled", diag["enabled"])
+
+
+def resetDiagnostics():
+    """Drop recorded timings."""
+    diag["timers"].clear()
+
+
+def diagnostics():
+    """Snapshot of recorded timings, in milliseconds."""
+    timers = {}
+    for name, timer in diag["timers"].items():
+        timers[name] = {"count": timer["count"],
+                        "total": timer["total"],
+                        "mean": timer["total"] / timer["count"],
+                        "max": timer["max"],
+                        "histogram": list(timer["histogram"]),
+                        "recent": [list(r) for r in timer["recent"]]}
+    return {"enabled": diag["enabled"],
+            "bounds": list(diagBounds),
+            "timers": timers}
+
+
+class ActionRegistry(QtCore.QObject):
+    """Incrementally maintained index of main window actions. The main
+       window and non-widget objects below it (action groups, command
+       wrappers) are watched for child added and removed events. Changed
+       owners are rescanned on next lookup, when constructors already
+       set the object name and the text. Widgets are not watched, to
+       keep the event filter away from paint and input events. Actions
+       owned by widgets (toolbars, menus, dock widgets) are found by a
+       full search of the main window on start, on workbench activation
+       and when a lookup misses, at most once per scanInterval seconds.
+       Indexed actions are followed for name changes. Text is not
+       followed, as FreeCAD emits the changed signal on every enabled
+       and checked state update. Text set after an action was indexed
+       is checked on a lookup miss for the name and on the full
+       search."""
+
+    scanInterval = 2.0
+
+    def __init__(self, root):
+        super(ActionRegistry, self).__init__()
+        self.root = root
+        self.generation = 0
+        self.snapshot = None
+        self.snapshotGeneration = -1
+        self.dirty = set()
+        self.owners = {}
+        self.names = {}
+        self.byName = {}
+        self.unique = {}
+        self.loose = set()
+        self.tracked = set()
+        self.scanned = None
+        self.watch(root)
+
+    def eventFilter(self, obj, event):
+        """Mark owner as changed on child added or removed."""
+        t = event.type()
+        if t == QtCore.QEvent.ChildAdded or t == QtCore.QEvent.ChildRemoved:
+            self.dirty.add(obj)
+        return False
+
+    def watch(self, owner):
+        """Start tracking actions owned by the object."""
+        if owner not in self.owners:
+            self.owners[owner] = set()
+            owner.installEventFilter(self)
+            self.dirty.add(owner)
+
+    def unwatch(self, owner):
+        """Stop tracking the object and everything it owned."""
+        for child in self.owners.pop(owner, ()):
+            if child in self.owners:
+                self.unwatch(child)
+            else:
+                self.remove(child)
+        self.dirty.discard(owner)
+        try:
+            owner.removeEventFilter(self)
+        except RuntimeError:
+            pass
+
+    def flush(self):
+        """Rescan changed owners."""
+        while self.dirty:
+            owner = self.dirty.pop()
+            try:
+                self.scan(owner)
+            except RuntimeError:
+                self.unwatch(owner)
+
+    def scan(self, owner):
+        """Synchronize direct children of the owner with the index."""
+        old = self.owners[owner]
+        new = set()
+        for child in owner.children():
+            if isinstance(child, QtGui.QAction):
+                new.add(child)
+                if child in self.loose:
+                    self.loose.discard(child)
+                elif child not in old:
+                    self.add(child)
+            elif not isinstance(child, QtGui.QWidget):
+                new.add(child)
+                if child not in old:
+                    self.watch(child)
+        for child in old - new:
+            if child in self.owners:
+                self.unwatch(child)
+            else:
+                self.remove(child)
+        self.owners[owner] = new
+
+    def scanWidgets(self):
+        """Index actions owned by widgets, found by a full search of the
+           main window."""
+        self.flush()
+        self.scanned = clock()
+        found = set()
+        for action in self.root.findChildren(QtGui.QAction):
+            if action not in self.names:
+                self.add(action)
+                if action not in self.tracked:
+                    self.tracked.add(action)
+                    action.destroyed.connect(
+                        lambda obj=None, action=action:
+                        self.onDestroyed(action))
+                found.add(action)
+            elif action in self.loose:
+                found.add(action)
+        for action in self.loose - found:
+            self.remove(action)
+        self.loose = found
+        for name in list(self.byName):
+            self.update(name)
+
+    def add(self, action):
+        """Index the action and follow its object name. The signal is
+           connected once, until the action is removed."""
+        name = action.objectName()
+        self.names[action] = name
+        self.byName.setdefault(name, []).append(action)
+        action.objectNameChanged.connect(self.onObjectNameChanged)
+        self.update(name)
+
+    def remove(self, action):
+        """Remove the action from the index."""
+        name = self.names.pop(action, None)
+        if name is not None:
+            self.loose.discard(action)
+            self.unlink(name, action)
+            try:
+                action.objectNameChanged.disconnect(self.onObjectNameChanged)
+            except (RuntimeError, TypeError):
+                pass
+
+    def unlink(self, name, action):
+        """Remove the action from the name."""
+        self.byName[name].remove(action)
+        if not self.byName[name]:
+            del self.byName[name]
+        self.update(name)
+
+    def onObjectNameChanged(self, name):
+        """Move renamed action to the new name."""
+        action = self.sender()
+        old = self.names.get(action)
+        if old is not None and old != name:
+            self.unlink(old, action)
+            self.names[action] = name
+            self.byName.setdefault(name, []).append(action)
+            self.update(name)
+
+    def onDestroyed(self, action):
+        """Remove destroyed widget owned action."""
+        self.tracked.discard(action)
+        if action in self.loose:
+            self.remove(action)
+
+    def update(self, name):
+        """Recompute unique action for the name."""
+        action = None
+        if name and "." not in name and "," not in name:
+            candidates = []
+            for i in self.byName.get(name, ()):
+                try:
+                    if i.text():
+                        candidates.append(i)
+                except RuntimeError:
+                    pass
+            if len(candidates) == 1:
+                action = candidates[0]
+        if self.unique.get(name) is not action:
+            if action:
+                self.unique[name] = action
+            else:
+                del self.unique[name]
+            self.generation += 1
+
+    def actions(self):
+        """Dictionary of unique actions, shared until next change."""
+        self.flush()
+        if self.snapshotGeneration != self.generation:
+            self.snapshot = dict(self.unique)
+            self.snapshotGeneration = self.generation
+        return self.snapshot
+
+    def find(self, name):
+        """Unique action for the name or None. A miss rechecks the text
+           of the actions with the name, then searches widget owned
+           actions, if not searched recently."""
+        self.flush()
+        action = self.unique.get(name)
+        if action is None and name in self.byName:
+            self.update(name)
+            action = self.unique.get(name)
+        if action is None and (self.scanned is None or
+                               clock() - self.scanned > self.scanInterval):
+            self.scanWidgets()
+            action = self.unique.get(name)
+        return action
+
+    def currentGeneration(self):
+        """Counter incremented on every change of unique actions."""
+        self.flush()
+        return self.generation
+
+
+@timed("actionList")
 def actionList():
     """Create a dictionary of unique actions. Exclude command names
        containing . to prevent domain name system clash. Exclude
        command names containing , to prevent possible join and split
        related issues. Exclude actions with no text, as that can
-       result in ambiguity, when selecting the command."""
-    actions = {}
-    duplicates = []
-    for i in mw.findChildren(QtGui.QAction):
-        name = i.objectName()
-        if (name and
-                i.text() and
-                "." not in name and
-                "," not in name):
-            if name in actions:
-                if name not in duplicates:
-                    duplicates.append(name)
-            else:
-                actions[name] = i
-    for d in duplicates:
-        del actions[d]
-    return actions
+       result in ambiguity, when selecting the command. The dictionary
+       is shared between callers and must not be modified."""
+    return registry.actions()
 
 
-def wbIcon(i):
-    """Create workbench icon."""
-    if str(i.find("XPM")) != "-1":
-        icon = []
-        for a in ((((i
-                     .split('{', 1)[1])
-                    .rsplit('}', 1)[0])
-                   .strip())
-                  .split("\n")):
-            icon.append((a
-                         .split('"', 1)[1])
-                        .rsplit('"', 1)[0])
-        icon = QtGui.QIcon(QtGui.QPixmap(icon))
+def findAction(name):
+    """Return unique action matching the command name."""
+    return registry.find(name)
+
+
+def rescanActions():
+    """Search actions owned by widgets, called on workbench activation
+       when new toolbars are created."""
+    registry.scanWidgets()
+
+
+def actionGeneration():
+    """Return action registry generation. It changes when unique actions
+       change and can be used to detect stale cached views."""
+    return registry.currentGeneration()
+
+
+class VolatileGroup(object):
+    """In-memory parameter group, used for the System presets. Provides
+       the subset of the ParameterGrp interface used by cube menu, so
+       presets never touch the user parameter file."""
+
+    def __init__(self):
+        self.groups = {}
+        self.values = {}
+        self.observers = []
+
+    def Attach(self, observer):
+        """Attach observer."""
+        self.observers.append(observer)
+
+    def Detach(self, observer):
+        """Detach observer."""
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    def Notify(self, name):
+        """Notify observers about a change."""
+        for observer in list(self.observers):
+            observer.OnChange(self, name)
+
+    def GetGroup(self, name):
+        """Return subgroup, create it if needed."""
+        if name not in self.groups:
+            self.groups[name] = VolatileGroup()
+        return self.groups[name]
+
+    def HasGroup(self, name):
+        """Check if subgroup exists."""
+        return name in self.groups
+
+    def GetGroups(self):
+        """Return subgroup names."""
+        return list(self.groups)
+
+    def RemGroup(self, name):
+        """Remove subgroup."""
+        if self.groups.pop(name, None):
+            self.Notify(name)
+
+    def Clear(self):
+        """Remove all subgroups and values."""
+        self.groups.clear()
+        self.values.clear()
+        self.Notify("")
+
+    def get(self, kind, name, default):
+        """Return value or default."""
+        return self.values.get((kind, name), default)
+
+    def set(self, kind, name, value):
+        """Set value and notify observers."""
+        self.values[(kind, name)] = value
+        self.Notify(name)
+
+    def rem(self, kind, name):
+        """Remove value and notify observers."""
+        if self.values.pop((kind, name), None) is not None:
+            self.Notify(name)
+
+    def GetString(self, name, default=""):
+        """Return string value."""
+        return self.get("String", name, default)
+
+    def SetString(self, name, value):
+        """Set string value."""
+        self.set("String", name, value)
+
+    def RemString(self, name):
+        """Remove string value."""
+        self.rem("String", name)
+
+    def GetInt(self, name, default=0):
+        """Return integer value."""
+        return self.get("Int", name, default)
+
+    def SetInt(self, name, value):
+        """Set integer value."""
+        self.set("Int", name, int(value))
+
+    def RemInt(self, name):
+        """Remove integer value."""
+        self.rem("Int", name)
+
+    def GetBool(self, name, default=False):
+        """Return boolean value."""
+        return self.get("Bool", name, bool(default))
+
+    def SetBool(self, name, value):
+        """Set boolean value."""
+        self.set("Bool", name, bool(value))
+
+    def RemBool(self, name):
+        """Remove boolean value."""
+        self.rem("Bool", name)
+
+
+class ParamObserver(object):
+    """Parameter group observer."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def OnChange(self, grp, reason):
+        """Mark cached parameter views as stale and refresh the mirror."""
+        invalidate()
+        refreshMirror(self.key, grp, reason)
+
+
+def invalidate():
+    """Increment the parameter revision. Called by the parameter observer
+       and by functions removing or clearing groups, as removed groups
+       can't be observed anymore."""
+    global revision
+    revision += 1
+
+
+def paramRevision():
+    """Return parameter revision."""
+    return revision
+
+
+def observe(key, group):
+    """Attach parameter observer to the group, once per key. The group
+       is kept with the observer, FreeCAD detaches observers when the
+       group object they were attached through is destroyed."""
+    if key not in observed:
+        observer = ParamObserver(key)
+        group.Attach(observer)
+        observed[key] = (group, observer)
+    return group
+
+
+def forget(key, keep=False):
+    """Forget observers for removed group and its subgroups. Keep the
+       observer of the group itself, if the group was only cleared."""
+    for k in list(observed):
+        if (k == key and not keep) or k.startswith(key + "."):
+            group, observer = observed.pop(k)
+            group.Detach(observer)
+    for k in list(mirror):
+        if k == key or k.startswith(key + "."):
+            del mirror[k]
+    invalidate()
+
+
+def sourceGroup(source):
+    """Return group for the source. System presets are kept in memory,
+       only User menus are stored in the parameter file."""
+    if source == "System":
+        return system
+    return p.GetGroup(source)
+
+
+def workbenchGroup(source, workbench):
+    """Return observed base group for source and workbench."""
+    return observe(source + "." + workbench,
+                   sourceGroup(source).GetGroup(workbench))
+
+
+def mirrorEntry(source, workbench):
+    """Return the in-memory mirror of the workbench menus. The mirror holds
+       the index, slot to uuid and name maps and the uuid to slot map. It
+       is read once and then kept up to date by the parameter observers."""
+    key = source + "." + workbench
+    entry = mirror.get(key)
+    if entry is None:
+        entry = {"index": [], "uuids": {}, "slots": {}, "names": {}}
+        mirror[key] = entry
+        refreshIndex(key, workbenchGroup(source, workbench), entry)
+    return entry
+
+
+def refreshIndex(key, base, entry):
+    """Read new slots and drop removed slots from the mirror entry."""
+    index = splitIndex(base)
+    old = entry["index"]
+    append = index[:len(old)] == old
+    if append:
+        added = index[len(old):]
+    else:
+        current = set(index)
+        for slot in set(entry["slots"]) - current:
+            del entry["slots"][slot]
+            del entry["names"][slot]
+        added = [i for i in index if i not in entry["slots"]]
+    for slot in added:
+        g = observe(key + "." + slot, base.GetGroup(slot))
+        entry["slots"][slot] = g.GetString("uuid")
+        entry["names"][slot] = g.GetString("name")
+    entry["index"] = index
+    if not append:
+        rebuildUuids(entry)
     else:
-        icon = QtGui.QIcon(QtGui.QPixmap(i))
-    if icon.isNull():
-        icon = QtGui.QIcon(":/icons/freecad")
-    return icon
+        for slot in added:
+            uid = entry["slots"][slot]
+            if uid in entry["uuids"]:
+                rebuildUuids(entry)
+                break
+            elif uid:
+                entry["uuids"][uid] = slot
+
+
+def rebuildUuids(entry):
+    """Rebuild uuid to slot map, the last slot wins for duplicates and
+       slots without uuid are skipped."""
+    uuids = {}
+    for slot in entry["index"]:
+        if entry["slots"][slot]:
+            uuids[entry["slots"][slot]] = slot
+    entry["uuids"] = uuids
+
+
+def refreshMirror(key, grp, reason):
+    """Apply observed parameter change to the mirror."""
+    d = key.split(".")
+    if len(d) == 2 and reason == "index" and key in mirror:
+        refreshIndex(key, grp, mirror[key])
+    elif len(d) == 3:
+        entry = mirror.get(d[0] + "." + d[1])
+        slot = d[2]
+        if entry and slot in entry["slots"]:
+            if reason == "uuid":
+                old = entry["slots"][slot]
+                uid = grp.GetString("uuid")
+                entry["slots"][slot] = uid
+                if old == uid:
+                    pass
+                elif entry["uuids"].get(old) == slot or uid in entry["uuids"]:
+                    rebuildUuids(entry)
+                elif uid:
+                    entry["uuids"][uid] = slot
+            elif reason == "name":
+                entry["names"][slot] = grp.GetString("name")
+
+
+def catalogPath():
+    """Command catalog file path."""
+    return os.path.join(App.getUserAppDataDir(), "CubeMenu", "Catalog.json")
+
+
+def menuList(source, workbench):
+    """Return list of (uuid, name) menus of the workbench in index order."""
+    entry = mirrorEntry(source, workbench)
+    return [(entry["slots"][i], entry["names"][i]) for i in entry["index"]]
+
+
+def mark(stage):
+    """Record the time a startup stage was first reached."""
+    if stage not in startup:
+        startup[stage] = time.time()
+
+
+def startupTimes():
+    """Return startup breakdown in seconds. Stages not reached yet are
+       None. Import is the import of the startup modules, wait is the time
+       until the event loop starts and bootstrap is the event driven start.
+       Ready is the time from the import until the menus are hooked. Menu
+       is the first population of the cube menu and first menu the time
+       from the import to it, on the first right click."""
+
+    def span(a, b):
+        if a in startup and b in startup:
+            return startup[b] - startup[a]
+        return None
+
+    return {"import": span("importStart", "importEnd"),
+            "wait": span("importEnd", "bootstrapStart"),
+            "bootstrap": span("bootstrapStart", "bootstrapEnd"),
+            "ready": span("importStart", "ready"),
+            "menu": span("menuStart", "menuEnd"),
+            "firstMenu": span("importStart", "menuEnd")}
+
+
+def wbIcon(i):
+    """Create workbench icon. Kept for compatibility, icon helpers are
+       loaded on first use from CubeMenuIcons."""
+    import CubeMenuIcons as cpi
+    return cpi.wbIcon(i)
 
 
 def defaultGroup(base):
@@ -135,17 +725,16 @@ def splitDomain(domain=None):
     return [prefix, source, workbench, uid]
 
 
+@timed("findGroup")
 def findGroup(domain):
     """Find group matching the domain name."""
     g = None
     d = splitDomain(domain)
     if all(d):
         prefix, source, workbench, uid = d
-        base = p.GetGroup(source).GetGroup(workbench)
-        index = splitIndex(base)
-        for i in index:
-            if base.GetGroup(i).GetString("uuid") == uid:
-                g = base.GetGroup(i)
+        slot = mirrorEntry(source, workbench)["uuids"].get(uid)
+        if slot:
+            g = workbenchGroup(source, workbench).GetGroup(slot)
     return g
 
 
@@ -155,32 +744,73 @@ def newGroup(domain):
     d = splitDomain(domain)
     if all(d):
         prefix, source, workbench, uid = d
-        base = p.GetGroup(source).GetGroup(workbench)
-        index = splitIndex(base)
-        x = 1
-        while str(x) in index and x < 1000:
-            x += 1
-        index.append(str(x))
-        base.SetString("index", ",".join(index))
-        g = base.GetGroup(str(x))
-        g.SetString("uuid", uid)
+        g = newGroups(source, workbench, [uid])[0]
     return g
 
 
+def newGroups(source, workbench, uids):
+    """Create new groups for the list of uuids. Slots are allocated in
+       bulk and the index is written once."""
+    groups = []
+    if source and workbench and uids:
+        base = workbenchGroup(source, workbench)
+        index = list(mirrorEntry(source, workbench)["index"])
+        slots = allocate(source, workbench, len(uids))
+        index.extend(slots)
+        base.SetString("index", ",".join(index))
+        for slot, uid in zip(slots, uids):
+            g = base.GetGroup(slot)
+            g.SetString("uuid", uid)
+            groups.append(g)
+    return groups
+
+
+def allocate(source, workbench, count=1):
+    """Allocate new slots from the persisted next slot number. Parameter
+       files without it start after the highest slot in the index. Slots
+       created by older versions, above next, are skipped."""
+    base = workbenchGroup(source, workbench)
+    entry = mirrorEntry(source, workbench)
+    x = base.GetInt("next", 0)
+    if x < 1:
+        x = 1
+        for i in entry["index"]:
+            try:
+                x = max(x, int(i) + 1)
+            except ValueError:
+                pass
+    slots = []
+    while len(slots) < count:
+        if str(x) not in entry["slots"]:
+            slots.append(str(x))
+        x += 1
+    base.SetInt("next", x)
+    return slots
+
+
 def deleteGroup(domain):
     """Delete group matching the domain name."""
     d = splitDomain(domain)
     if all(d):
         temp = []
         prefix, source, workbench, uid = d
-        base = p.GetGroup(source).GetGroup(workbench)
-        index = splitIndex(base)
-        for i in index:
-            if base.GetGroup(i).GetString("uuid") == uid:
+        base = workbenchGroup(source, workbench)
+        entry = mirrorEntry(source, workbench)
+        for i in list(entry["index"]):
+            if entry["slots"][i] == uid:
                 base.RemGroup(i)
+                forget(".".join([source, workbench, i]))
             else:
                 temp.append(i)
         base.SetString("index", ",".join(temp))
         defaultGroup(base)
         return True
     return False
+
+
+system = VolatileGroup()
+registry = ActionRegistry(mw)
+registry.scanWidgets()
+profileObserver = ProfileObserver()
+profile.Attach(profileObserver)
+observe("", p)
@@ -0,0 +1,159 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+
+"""Cube menu for FreeCAD - Generator.
+
+Synthetic menu configurations for scale testing. Menus are written to
+the CPMenu parameter layout, with nested menus, global default
+expansions and references to unavailable commands. Matching actions
+and toolbars are created under the main window. The same seed gives
+the same configuration.
+
+import CubeMenuGenerator as cpg
+
+
+config = cpg.generate(workbenches=20, menus=50, commands=40, seed=1)
+cpg.remove(config)"""
+
+
+import uuid
+import random
+from PySide import QtGui
+import FreeCADGui as Gui
+import CubeMenuCommon as cpc
+
+
+mw = Gui.getMainWindow()
+prefix = "CubeMenuGen"
+
+
+def workbenchNames(workbenches):
+    """Names of generated workbenches, or the given names. Generated
+       workbenches are registered when FreeCADGui supports it, as the
+       stand-ins from CubeMenuStubs do."""
+    if not isinstance(workbenches, int):
+        return list(workbenches)
+    names = []
+    for i in range(workbenches):
+        name = prefix + str(i) + "Workbench"
+        if hasattr(Gui, "addWorkbench"):
+            Gui.addWorkbench(name, "Generated " + str(i))
+        names.append(name)
+    return names
+
+
+def menuCommands(rng, config, domains, commands):
+    """Commands of one generated menu."""
+    items = []
+    if rng.random() < config["globalDefault"]:
+        items.append("CPGlobalDefault")
+    while len(items) < commands:
+        r = rng.random()
+        if r < config["dangling"]:
+            items.append(prefix + "_Missing" + str(rng.randrange(1000)))
+        elif r < config["dangling"] + config["nested"] and len(domains) > 1:
+            items.append(rng.choice(domains))
+        elif r < config["dangling"] + config["nested"] + 0.1:
+            items.append("CPSeparator")
+        else:
+            items.append(rng.choice(config["commands"]))
+    return items
+
+
+def createActions(names):
+    """Actions for the command names."""
+    actions = []
+    for name in names:
+        a = QtGui.QAction(mw)
+        a.setObjectName(name)
+        number = name.rsplit("_", 1)[1]
+        a.setText("Generated command " + number)
+        a.setToolTip("Generated " + name)
+        actions.append(a)
+    return actions
+
+
+def generate(workbenches=10, menus=20, commands=30, seed=0,
+             source="User", pool=None, nested=0.05, dangling=0.02,
+             globalDefault=0.2, toolbars=True):
+    """Write workbenches x menus x commands menus of the source (User is
+       stored in the parameter file, System is kept in memory). Pool is
+       the number of available commands, by default ten times the menu
+       length. Nested, dangling and globalDefault are the probabilities
+       of menu references, unavailable commands and CPGlobalDefault.
+       Returns the configuration, to be passed to remove."""
+    rng = random.Random(seed)
+    if pool is None:
+        pool = commands * 10
+    config = {"seed": seed,
+              "source": source,
+              "nested": nested,
+              "dangling": dangling,
+              "globalDefault": globalDefault,
+              "commands": [prefix + "_Cmd" + str(i) for i in range(pool)],
+              "workbenches": workbenchNames(workbenches),
+              "domains": {},
+              "actions": [],
+              "toolbars": []}
+    config["actions"] = createActions(config["commands"])
+
+    for wb in config["workbenches"]:
+        uids = [str(uuid.UUID(int=rng.getrandbits(128), version=4))
+                for i in range(menus)]
+        domains = [".".join(["CPMenu", source, wb, uid]) for uid in uids]
+        groups = cpc.newGroups(source, wb, uids)
+        for i, group in enumerate(groups):
+            group.SetString("name", "Menu " + str(i))
+            group.SetString("commands",
+                            ",".join(menuCommands(rng, config, domains,
+                                                  commands)))
+        if domains:
+            cpc.workbenchGroup(source, wb).SetString("default", domains[0])
+        config["domains"][wb] = domains
+
+        if toolbars:
+            tb = QtGui.QToolBar(mw)
+            tb.setObjectName(wb + " tools")
+            tb.addActions(rng.sample(config["actions"],
+                                     min(10, len(config["actions"]))))
+            config["toolbars"].append(tb)
+
+    return config
+
+
+def remove(config):
+    """Remove generated menus, actions and toolbars. Menus of given
+       workbench names are deleted one by one, keeping other menus."""
+    source = config["source"]
+    for wb in config["workbenches"]:
+        if wb.startswith(prefix):
+            cpc.sourceGroup(source).RemGroup(wb)
+            cpc.forget(source + "." + wb)
+            if hasattr(Gui, "removeWorkbench"):
+                Gui.removeWorkbench(wb)
+        else:
+            for domain in config["domains"][wb]:
+                cpc.deleteGroup(domain)
+    for obj in config["actions"] + config["toolbars"]:
+        obj.setParent(None)
+        obj.deleteLater()
+    config["actions"] = []
+    config["toolbars"] = []
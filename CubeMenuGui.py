@@ -21,22 +21,28 @@
 """Cube menu for FreeCAD - Gui."""
 
 
+import os
+import sys
 from PySide import QtGui
 from PySide import QtCore
 import FreeCAD as App
 import FreeCADGui as Gui
 import CubeMenuCommon as cpc
 import CubeMenuCommands as cpcmd
-import CubeMenuPreferences as cpp
 
 
 p = cpc.p
 mw = Gui.getMainWindow()
+# Delay of the first catalog record after start (ms)
+recordDelay = 2000
 
 
+@cpc.profiled("menu")
 def onShow():
     """Populate menu on show."""
+    cpc.mark("menuStart")
     cpcmd.populateTop()
+    cpc.mark("menuEnd")
 
 
 class DocumentObserver(object):
@@ -82,32 +88,55 @@ def accessoriesMenu():
             mw.workbenchActivated.connect(addMenu)
 
 
+def onWorkbenchActivated():
+    """Record commands of the activated workbench in the catalog, once
+       the catalog is in use: loaded in this session or stored by an
+       earlier one. Otherwise the catalog and icon modules are not
+       imported."""
+    if ("CubeMenuCatalog" in sys.modules or
+            os.path.exists(cpc.catalogPath())):
+        import CubeMenuCatalog as cpcat
+        cpcat.schedule()
+
+
+@cpc.profiled("dialog")
 def onPreferences():
     """Open the preferences dialog."""
-    cpp.createWidgets()
-    dialog = cpp.dialog()
-    dialog.show()
+    import CubeMenuPreferences as cpp
+    cpp.showDialog()
+
+
+class Bootstrap(QtCore.QObject):
+    """Start the cube menu when the event loop starts. FreeCAD sets the
+       eventLoop property of the main window just before entering the
+       event loop, which is delivered as a dynamic property change."""
+
+    def eventFilter(self, obj, event):
+        """Post the start on eventLoop property change."""
+        if (event.type() == QtCore.QEvent.DynamicPropertyChange and
+                event.propertyName().data() == b"eventLoop"):
+            mw.removeEventFilter(self)
+            QtCore.QTimer.singleShot(0, onStart)
+        return False
 
 
 def onStart():
     """Start the cube menu."""
-    start = False
-    try:
-        mw.mainWindowClosed
-        start = True
-    except AttributeError:
-        pass
-    if start:
-        t.stop()
-        t.deleteLater()
-        accessoriesMenu()
-        mw.mainWindowClosed.connect(onClose)
-        observer = DocumentObserver()
-        App.addDocumentObserver(observer)
+    cpc.mark("bootstrapStart")
+    accessoriesMenu()
+    mw.mainWindowClosed.connect(onClose)
+    mw.workbenchActivated.connect(cpcmd.onWorkbenchActivated)
+    mw.workbenchActivated.connect(onWorkbenchActivated)
+    QtCore.QTimer.singleShot(recordDelay, onWorkbenchActivated)
+    observer = DocumentObserver()
+    App.addDocumentObserver(observer)
+    cpc.mark("bootstrapEnd")
+    cpc.mark("ready")
 
 
 def onClose():
-    """Remove system presets and groups without index on FreeCAD close."""
+    """Remove groups without index on FreeCAD close. System presets are
+       kept in memory, remove the ones stored by older versions."""
     p.RemGroup("System")
 
     for wb in Gui.listWorkbenches():
@@ -119,14 +148,13 @@ def onClose():
 def onPreStart():
     """Start in FreeCAD 0.18 or above."""
     version = App.Version()[0] + "." + App.Version()[1]
-    if version >= "0.18":
+    if version >= "0.18" and hasattr(mw, "mainWindowClosed"):
         if mw.property("eventLoop"):
-            onStart()
-    else:
-        t.stop()
-        t.deleteLater()
+            QtCore.QTimer.singleShot(0, onStart)
+        else:
+            mw.installEventFilter(bootstrap)
 
 
-t = QtCore.QTimer()
-t.timeout.connect(onPreStart)
-t.start(500)
+bootstrap = Bootstrap()
+onPreStart()
+cpc.mark("importEnd")
@@ -0,0 +1,268 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+"""Cube menu for FreeCAD - Icons."""
+
+
+import os
+import hashlib
+from collections import OrderedDict
+from PySide import QtGui
+from PySide import QtCore
+import FreeCAD as App
+import CubeMenuCommon as cpc
+
+
+p = cpc.p
+path = os.path.dirname(__file__) + "/Resources/icons/"
+cacheSize = 128
+cache = OrderedDict()
+# Command icons of the catalog, kept apart from the workbench icons
+commandCacheSize = 2048
+commandCache = OrderedDict()
+stats = {"hits": 0, "misses": 0, "evictions": 0,
+         "diskHits": 0, "diskWrites": 0, "diskEvictions": 0}
+sizes = (16, 32, 64)
+disk = {"dir": None, "files": None, "total": 0}
+
+
+def sourceKey(source):
+    """Hash of the icon source."""
+    try:
+        data = source.encode("UTF-8")
+    except (AttributeError, UnicodeDecodeError):
+        data = source
+    return hashlib.sha1(data).hexdigest()
+
+
+@cpc.timed("wbIcon")
+def wbIcon(i):
+    """Create workbench icon. Icons are shared by all callers, in a least
+       recently used cache keyed by the hash of the icon source."""
+    return cachedIcon(i, createIcon)
+
+
+def fileIcon(name):
+    """Create icon from the bundled Resources/icons file."""
+    return cachedIcon(path + name, createFileIcon)
+
+
+def keyIcon(key):
+    """Create icon stored in the disk cache by iconKey. Command icons
+       have their own cache, sized for the catalog."""
+    return cachedIcon("raster:" + key, createKeyIcon,
+                      commandCache, commandCacheSize)
+
+
+def iconKey(icon):
+    """Store icon rasters in the disk cache and return their key, the
+       hash of the largest raster. Empty string for null icons or when
+       the disk cache is disabled."""
+    if icon.isNull() or not p.GetBool("IconDiskCache", 1):
+        return ""
+    size = sizes[-1]
+    data = QtCore.QByteArray()
+    buf = QtCore.QBuffer(data)
+    buf.open(QtCore.QIODevice.WriteOnly)
+    icon.pixmap(size, size).save(buf, "PNG")
+    buf.close()
+    key = sourceKey(data.data())
+    diskDir()
+    if key + "-" + str(size) + ".png" not in disk["files"]:
+        saveRasters(key, icon)
+    return key
+
+
+def cachedIcon(source, create, store=None, cap=None):
+    """Return icon from the cache, by default the workbench icon cache,
+       create it on cache miss."""
+    if store is None:
+        store, cap = cache, cacheSize
+    key = sourceKey(source)
+    icon = store.pop(key, None)
+    if icon is None:
+        stats["misses"] += 1
+        icon = create(source)
+        while len(store) >= cap:
+            store.popitem(last=False)
+            stats["evictions"] += 1
+    else:
+        stats["hits"] += 1
+    store[key] = icon
+    return icon
+
+
+def cacheStats():
+    """Return icon cache counters."""
+    result = dict(stats)
+    result["size"] = len(cache)
+    result["cap"] = cacheSize
+    result["commandSize"] = len(commandCache)
+    result["commandCap"] = commandCacheSize
+    result["diskSize"] = disk["total"]
+    return result
+
+
+def clearCache():
+    """Empty the icon caches."""
+    cache.clear()
+    commandCache.clear()
+
+
+def createIcon(i):
+    """Create workbench icon from XPM string or file."""
+    icon = rasterIcon(i, decodeIcon)
+    if icon.isNull():
+        icon = QtGui.QIcon(":/icons/freecad")
+    return icon
+
+
+def createKeyIcon(source):
+    """Create icon from disk cache rasters."""
+    icon = loadRasters(source.split(":", 1)[1])
+    if not icon:
+        icon = QtGui.QIcon(":/icons/freecad")
+    return icon
+
+
+def createFileIcon(source):
+    """Create icon from file."""
+    return rasterIcon(source, QtGui.QIcon)
+
+
+def decodeIcon(i):
+    """Decode XPM string or load icon file."""
+    if str(i.find("XPM")) != "-1":
+        icon = []
+        for a in ((((i
+                     .split('{', 1)[1])
+                    .rsplit('}', 1)[0])
+                   .strip())
+                  .split("\n")):
+            icon.append((a
+                         .split('"', 1)[1])
+                        .rsplit('"', 1)[0])
+        icon = QtGui.QIcon(QtGui.QPixmap(icon))
+    else:
+        icon = QtGui.QIcon(QtGui.QPixmap(i))
+    return icon
+
+
+def diskKey(source):
+    """Hash of the icon source for the disk cache. File sources include
+       the file modification time and size, to invalidate changed files.
+       Returns None for sources that can't be validated."""
+    if str(source.find("XPM")) != "-1":
+        return sourceKey(source)
+    try:
+        st = os.stat(source)
+    except (OSError, TypeError, ValueError):
+        return None
+    return sourceKey("%s|%r|%d" % (source, st.st_mtime, st.st_size))
+
+
+def diskDir():
+    """Disk cache directory, scanned once per session."""
+    if disk["dir"] is None:
+        disk["dir"] = os.path.join(App.getUserAppDataDir(),
+                                   "CubeMenu",
+                                   "IconCache")
+        files = {}
+        try:
+            for name in os.listdir(disk["dir"]):
+                if name.endswith(".png"):
+                    st = os.stat(os.path.join(disk["dir"], name))
+                    files[name] = [st.st_mtime, st.st_size]
+        except OSError:
+            pass
+        disk["files"] = files
+        disk["total"] = sum(f[1] for f in files.values())
+    return disk["dir"]
+
+
+def rasterIcon(source, create):
+    """Load icon rasters from the disk cache (IconDiskCache parameter) or
+       create the icon and store its rasters."""
+    key = None
+    if p.GetBool("IconDiskCache", 1):
+        key = diskKey(source)
+    if key:
+        icon = loadRasters(key)
+        if icon:
+            stats["diskHits"] += 1
+            return icon
+    icon = create(source)
+    if key and not icon.isNull():
+        saveRasters(key, icon)
+    return icon
+
+
+def loadRasters(key):
+    """Load all raster sizes, None if any is missing or invalid."""
+    directory = diskDir()
+    icon = QtGui.QIcon()
+    for size in sizes:
+        name = key + "-" + str(size) + ".png"
+        if name not in disk["files"]:
+            return None
+        pix = QtGui.QPixmap()
+        if not pix.load(os.path.join(directory, name), "PNG"):
+            return None
+        icon.addPixmap(pix)
+    return icon
+
+
+def saveRasters(key, icon):
+    """Store icon rasters and evict the oldest files over the size cap
+       (IconDiskCacheSize parameter, in KB)."""
+    directory = diskDir()
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for size in sizes:
+            name = key + "-" + str(size) + ".png"
+            f = os.path.join(directory, name)
+            pix = icon.pixmap(size, size)
+            if pix.isNull() or not pix.save(f, "PNG"):
+                return
+            st = os.stat(f)
+            if name in disk["files"]:
+                disk["total"] -= disk["files"][name][1]
+            disk["files"][name] = [st.st_mtime, st.st_size]
+            disk["total"] += st.st_size
+            stats["diskWrites"] += 1
+    except OSError:
+        return
+    evictDisk(p.GetInt("IconDiskCacheSize", 4096) * 1024)
+
+
+def evictDisk(cap):
+    """Remove oldest raster files until the disk cache fits the cap."""
+    if disk["total"] <= cap:
+        return
+    for name in sorted(disk["files"], key=lambda n: disk["files"][n][0]):
+        if disk["total"] <= cap:
+            break
+        try:
+            os.remove(os.path.join(disk["dir"], name))
+        except OSError:
+            pass
+        disk["total"] -= disk["files"].pop(name)[1]
+        stats["diskEvictions"] += 1
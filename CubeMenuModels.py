@@ -0,0 +1,845 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+"""Cube menu for FreeCAD - Models."""
+
+
+import re
+import bisect
+from PySide import QtGui
+from PySide import QtCore
+import FreeCADGui as Gui
+import CubeMenuCommon as cpc
+import CubeMenuIcons as cpi
+import CubeMenuCatalog as cpcat
+
+
+def actionData(action, role):
+    """Data roles of an action, created on request."""
+    if role == QtCore.Qt.DisplayRole:
+        return action.text().replace("&", "")
+    elif role == QtCore.Qt.ToolTipRole:
+        return action.toolTip()
+    elif role == QtCore.Qt.DecorationRole:
+        icon = action.icon()
+        if icon.isNull():
+            icon = QtGui.QIcon(":/icons/freecad")
+        return icon
+    return None
+
+
+def entryData(entry, role):
+    """Data roles of a catalog entry [text, tooltip, icon key]."""
+    if role == QtCore.Qt.DisplayRole:
+        return entry[0]
+    elif role == QtCore.Qt.ToolTipRole:
+        return entry[1]
+    elif role == QtCore.Qt.DecorationRole:
+        if entry[2]:
+            return cpi.keyIcon(entry[2])
+        return QtGui.QIcon(":/icons/freecad")
+    return None
+
+
+def missingIcon():
+    """Disabled FreeCAD icon for commands not currently available."""
+    icon = QtGui.QIcon()
+    icon.addPixmap(QtGui.QPixmap(":/icons/freecad"))
+    return QtGui.QIcon(icon.pixmap(256, QtGui.QIcon.Disabled))
+
+
+class CommandModel(QtCore.QAbstractListModel):
+    """Available commands, sorted by text. Rows are the current actions,
+       or the catalog entries of a workbench that is not active. Rows are
+       rebuilt only when the action registry generation or the source
+       changes."""
+
+    def __init__(self, parent=None):
+        super(CommandModel, self).__init__(parent)
+        self.generation = None
+        self.source = None
+        self.actions = {}
+        self.entries = {}
+        self.names = []
+
+    def refresh(self, entries=None, source=None):
+        """Rebuild rows if actions or source changed. Entries is a catalog
+           dictionary of command name and [text, tooltip, icon key] and
+           source identifies it, without entries rows are the current
+           actions."""
+        generation = cpc.actionGeneration()
+        if generation == self.generation and source == self.source:
+            return False
+        self.beginResetModel()
+        self.generation = generation
+        self.source = source
+        self.actions = cpc.actionList()
+        if entries is None:
+            self.entries = {}
+            names = self.actions
+        else:
+            self.entries = entries
+            names = entries
+        keys = {}
+        for name in names:
+            keys[name] = self.text(name)
+        self.names = sorted(keys, key=lambda n: (keys[n], n))
+        self.endResetModel()
+        return True
+
+    def text(self, name):
+        """Command text, from the action if available."""
+        if name in self.actions:
+            return self.actions[name].text().replace("&", "")
+        return self.entries[name][0]
+
+    def toolTip(self, name):
+        """Command tooltip, from the action if available."""
+        if name in self.actions:
+            return self.actions[name].toolTip()
+        return self.entries[name][1]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Number of commands."""
+        if parent.isValid():
+            return 0
+        return len(self.names)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Command data, UserRole is the command name."""
+        if not index.isValid() or index.row() >= len(self.names):
+            return None
+        name = self.names[index.row()]
+        if role == QtCore.Qt.UserRole:
+            return name
+        elif name in self.actions:
+            return actionData(self.actions[name], role)
+        return entryData(self.entries[name], role)
+
+
+class EnabledModel(QtCore.QAbstractListModel):
+    """Commands of the edited menu, in menu order."""
+
+    def __init__(self, parent=None):
+        super(EnabledModel, self).__init__(parent)
+        self.items = []
+        self.missing = None
+
+    def setCommands(self, items):
+        """Replace all commands."""
+        self.beginResetModel()
+        self.items = list(items)
+        self.endResetModel()
+
+    def commands(self):
+        """List of command names."""
+        return list(self.items)
+
+    def insertCommand(self, row, name):
+        """Insert command at row."""
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.items.insert(row, name)
+        self.endInsertRows()
+
+    def removeCommand(self, row):
+        """Remove command at row."""
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.items[row]
+        self.endRemoveRows()
+
+    def moveCommand(self, row, to):
+        """Move command from row to row to."""
+        if to > row:
+            dest = to + 1
+        else:
+            dest = to
+        parent = QtCore.QModelIndex()
+        self.beginMoveRows(parent, row, row, parent, dest)
+        self.items.insert(to, self.items.pop(row))
+        self.endMoveRows()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Number of commands."""
+        if parent.isValid():
+            return 0
+        return len(self.items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Command data, UserRole is the command name."""
+        if not index.isValid() or index.row() >= len(self.items):
+            return None
+        i = self.items[index.row()]
+        if role == QtCore.Qt.UserRole:
+            return i
+        if i == "CPSeparator":
+            if role == QtCore.Qt.DisplayRole:
+                return "Separator"
+            elif role == QtCore.Qt.DecorationRole:
+                return cpi.fileIcon("CommandPanelAddSeparator.svg")
+        elif i.startswith("CPMenu"):
+            if role == QtCore.Qt.DisplayRole:
+                g = cpc.findGroup(i)
+                if not g:
+                    return "Menu"
+                try:
+                    text = g.GetString("name").decode("UTF-8")
+                except AttributeError:
+                    text = g.GetString("name")
+                return "Menu: " + text
+            elif role == QtCore.Qt.DecorationRole:
+                return cpi.fileIcon("CommandPanelAddMenu.svg")
+        else:
+            action = cpc.findAction(i)
+            if action:
+                return actionData(action, role)
+            entry = cpcat.command(i)
+            if role == QtCore.Qt.DisplayRole:
+                return entry[0] if entry else i
+            elif role == QtCore.Qt.ToolTipRole:
+                return "Command " + i + " is not currently available"
+            elif role == QtCore.Qt.DecorationRole:
+                if self.missing is None:
+                    self.missing = missingIcon()
+                return self.missing
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.UserRole):
+        """Set the command name."""
+        if not index.isValid() or role != QtCore.Qt.UserRole:
+            return False
+        self.items[index.row()] = value
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class TreeNode(object):
+    """Node of the menu tree. Children are None until fetched."""
+
+    def __init__(self, parent, row, kind, text, key=None):
+        self.parent = parent
+        self.row = row
+        self.kind = kind
+        self.text = text
+        self.key = key
+        self.children = None
+        self.pending = None
+
+
+class MenuTreeModel(QtCore.QAbstractItemModel):
+    """Menus of all workbenches and sources, and toolbars in copy mode.
+       Children are created when a node is expanded. One menu can be
+       checked, the checked node is tracked so a change costs O(1)."""
+
+    menuChecked = QtCore.Signal(str, str)
+
+    def __init__(self, parent=None):
+        super(MenuTreeModel, self).__init__(parent)
+        self.title = ""
+        self.current = None
+        self.toolbars = False
+        self.filter = ""
+        self.checked = None
+        self.checkedNode = None
+        self.workbenches = {}
+        self.root = TreeNode(None, 0, "root", "")
+        self.root.children = []
+
+    def load(self, current, toolbars=False, checked=None):
+        """Show menus for the current workbench, toolbars for copy mode
+           and optionally a checked domain."""
+        self.current = current
+        self.toolbars = toolbars
+        self.filter = ""
+        self.checked = checked
+        self.workbenches = {}
+        wb = Gui.listWorkbenches()
+        for i in wb:
+            self.workbenches[wb[i].__class__.__name__] = wb[i]
+        self.reset()
+
+    def clear(self):
+        """Remove all nodes."""
+        self.beginResetModel()
+        self.root = TreeNode(None, 0, "root", "")
+        self.root.children = []
+        self.checked = None
+        self.checkedNode = None
+        self.endResetModel()
+
+    def setFilter(self, text):
+        """Show only menus with name or workbench matching text."""
+        self.filter = text.strip().lower()
+        self.reset()
+
+    def reset(self):
+        """Rebuild top level nodes."""
+        self.beginResetModel()
+        self.checkedNode = None
+        self.root = TreeNode(None, 0, "root", "")
+        self.root.children = self.build(self.root)
+        self.endResetModel()
+
+    def setTitle(self, title):
+        """Header text."""
+        self.title = title
+        self.headerDataChanged.emit(QtCore.Qt.Horizontal, 0, 0)
+
+    def workbenchText(self, workbench):
+        """Workbench menu text."""
+        if workbench == "GlobalPanel":
+            return "Global"
+        wb = self.workbenches.get(workbench)
+        if wb is None:
+            return workbench
+        try:
+            return wb.MenuText.decode("UTF-8")
+        except AttributeError:
+            return wb.MenuText
+
+    def match(self, *texts):
+        """Check if any text matches the filter."""
+        if not self.filter:
+            return True
+        for text in texts:
+            if self.filter in text.lower():
+                return True
+        return False
+
+    def menus(self, source, workbench):
+        """List of (domain, name) of the menus matching the filter."""
+        result = []
+        wbText = self.workbenchText(workbench)
+        for uid, name in cpc.menuList(source, workbench):
+            try:
+                name = name.decode("UTF-8")
+            except AttributeError:
+                pass
+            if self.match(name, wbText):
+                domain = ".".join(["CPMenu", source, workbench, uid])
+                result.append((domain, name))
+        return result
+
+    def hasMenus(self, source, workbench):
+        """Check for menus matching the filter. Without filter the mirror
+           index is checked, without building the menu list."""
+        if self.filter:
+            return bool(self.menus(source, workbench))
+        return bool(cpc.mirrorEntry(source, workbench)["index"])
+
+    def build(self, node):
+        """Child nodes of a node."""
+        specs = []
+        if node.kind == "root":
+            wbs = sorted(Gui.listWorkbenches())
+            if self.current in wbs:
+                wbs.remove(self.current)
+            specs.append(("workbench", None, self.current))
+            specs.append(("group", "Workbenches", wbs))
+            if self.current != "GlobalPanel":
+                specs.append(("workbench", None, "GlobalPanel"))
+            if self.toolbars:
+                specs.append(("group", "Toolbars", None))
+        elif node.kind == "group" and node.key is None:
+            names = []
+            for tb in cpc.mw.findChildren(QtGui.QToolBar):
+                if tb.objectName() and self.match(tb.objectName()):
+                    names.append(tb.objectName())
+            for name in sorted(names):
+                specs.append(("toolbar", name, "CPMenu.Toolbar." + name))
+        elif node.kind == "group":
+            for workbench in node.key:
+                if (self.hasMenus("User", workbench) or
+                        self.hasMenus("System", workbench)):
+                    specs.append(("workbench", None, workbench))
+        elif node.kind == "workbench":
+            for source in ("User", "System"):
+                if self.hasMenus(source, node.key):
+                    specs.append(("source", source, (source, node.key)))
+        elif node.kind == "source":
+            for domain, name in self.menus(node.key[0], node.key[1]):
+                specs.append(("menu", name, domain))
+        children = []
+        for kind, text, key in specs:
+            if kind == "workbench" and text is None:
+                text = self.workbenchText(key)
+            child = TreeNode(node, len(children), kind, text, key)
+            if kind in ("menu", "toolbar"):
+                child.children = []
+                if key == self.checked:
+                    self.checkedNode = child
+            elif self.filter or (node.kind == "root" and
+                                 kind == "workbench" and
+                                 key == self.current):
+                child.children = self.build(child)
+            if (self.filter and child.children == [] and
+                    kind not in ("menu", "toolbar")):
+                continue
+            child.row = len(children)
+            children.append(child)
+        return children
+
+    def node(self, index):
+        """Node of an index."""
+        if index.isValid():
+            return index.internalPointer()
+        return self.root
+
+    def pendingChildren(self, node):
+        """Children of an unfetched node, built once."""
+        if node.pending is None:
+            node.pending = self.build(node)
+        return node.pending
+
+    def index(self, row, column=0, parent=QtCore.QModelIndex()):
+        """Index of a child node."""
+        node = self.node(parent)
+        if column != 0 or not node.children or row >= len(node.children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+
+    def parent(self, index=QtCore.QModelIndex()):
+        """Index of the parent node."""
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Number of fetched children."""
+        node = self.node(parent)
+        return len(node.children) if node.children else 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """Single column."""
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        """Check children without fetching them."""
+        node = self.node(parent)
+        if node.children is not None:
+            return bool(node.children)
+        return bool(self.pendingChildren(node))
+
+    def canFetchMore(self, parent):
+        """Children are not fetched yet."""
+        return self.node(parent).children is None
+
+    def fetchMore(self, parent):
+        """Insert children of the expanded node."""
+        node = self.node(parent)
+        if node.children is not None:
+            return
+        children = self.pendingChildren(node)
+        node.pending = None
+        if children:
+            self.beginInsertRows(parent, 0, len(children) - 1)
+            node.children = children
+            self.endInsertRows()
+        else:
+            node.children = []
+
+    def flags(self, index):
+        """Menus and toolbars are checkable."""
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.internalPointer().kind in ("menu", "toolbar"):
+            flags |= QtCore.Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Node text, workbench icon and check state."""
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            return node.text
+        elif role == QtCore.Qt.UserRole:
+            return node.key if node.kind in ("menu", "toolbar") else None
+        elif role == QtCore.Qt.CheckStateRole:
+            if node.kind in ("menu", "toolbar"):
+                if node is self.checkedNode:
+                    return QtCore.Qt.Checked
+                return QtCore.Qt.Unchecked
+        elif role == QtCore.Qt.DecorationRole:
+            if node.kind == "workbench" and node.key != "GlobalPanel":
+                try:
+                    return cpi.wbIcon(self.workbenches[node.key].Icon)
+                except (KeyError, AttributeError):
+                    return QtGui.QIcon(":/icons/freecad")
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.CheckStateRole):
+        """Check or uncheck a menu, unchecking the previous one."""
+        if not index.isValid() or role != QtCore.Qt.CheckStateRole:
+            return False
+        node = index.internalPointer()
+        previous = self.checkedNode
+        if value == QtCore.Qt.Checked or value == 2:
+            self.checkedNode = node
+            self.checked = node.key
+        elif node is previous:
+            self.checkedNode = None
+            self.checked = None
+        else:
+            return False
+        for n in (previous, node):
+            if n is not None and n.parent is not None:
+                i = self.createIndex(n.row, 0, n)
+                self.dataChanged.emit(i, i)
+        if self.checkedNode:
+            self.menuChecked.emit(node.key, node.text)
+        else:
+            self.menuChecked.emit("", node.text)
+        return True
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        """Header text."""
+        if role == QtCore.Qt.DisplayRole and section == 0:
+            return self.title
+        return None
+
+    def checkedIndex(self):
+        """Index of the checked domain, fetching nodes on its path."""
+        if not self.checked:
+            return QtCore.QModelIndex()
+        parts = self.checked.split(".")
+        if len(parts) < 3:
+            return QtCore.QModelIndex()
+        if parts[1] == "Toolbar":
+            path = [lambda n: n.kind == "group" and n.key is None]
+        elif len(parts) < 4:
+            return QtCore.QModelIndex()
+        else:
+            source, workbench = parts[1], parts[2]
+            if workbench in (self.current, "GlobalPanel"):
+                path = [lambda n: n.kind == "workbench" and
+                        n.key == workbench]
+            else:
+                path = [lambda n: n.kind == "group" and n.key is not None,
+                        lambda n: n.key == workbench]
+            path.append(lambda n: n.key == (source, workbench))
+        path.append(lambda n: n.key == self.checked)
+        parent = QtCore.QModelIndex()
+        for test in path:
+            node = self.node(parent)
+            self.fetchMore(parent)
+            found = None
+            for child in node.children or []:
+                if test(child):
+                    found = child
+                    break
+            if found is None:
+                return QtCore.QModelIndex()
+            parent = self.createIndex(found.row, 0, found)
+        self.checkedNode = parent.internalPointer()
+        return parent
+
+
+def words(text):
+    """Lowercase words of the text, split on non alphanumeric and on
+       camel case."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text).lower()
+    return [w for w in re.split(r"[^0-9a-z]+", text) if w]
+
+
+def deletions(word):
+    """Word and the variants with one character removed. Words within
+       one edit, transposition included, share a variant."""
+    keys = set([word])
+    for i in range(len(word)):
+        keys.add(word[:i] + word[i + 1:])
+    return keys
+
+
+def trigrams(text):
+    """Set of trigrams of the words in text, padded at word start."""
+    grams = set()
+    for w in words(text):
+        w = "  " + w
+        for i in range(len(w) - 2):
+            grams.add(w[i:i + 3])
+    return grams
+
+
+class SearchIndex(object):
+    """Search index over command text, name and tooltip. Query words
+       are looked up by prefix in a sorted word list. When few commands
+       match, fuzzy matches are added from a trigram index of text and
+       name, visiting only the rarest query trigrams, and from words of
+       text and name within one edit of each query word."""
+
+    def __init__(self, fuzzy=20, near=4):
+        self.fuzzy = fuzzy
+        self.near = near
+        self.fields = []
+        self.words = []
+        self.prefix = []
+        self.grams = {}
+        self.rowGrams = []
+        self.rowsByWord = {}
+        self.nearWords = {}
+
+    def build(self, model):
+        """Index rows of a CommandModel."""
+        self.fields = []
+        self.words = []
+        self.prefix = []
+        self.rowGrams = []
+        grams = {}
+        rowsByWord = {}
+        for row, name in enumerate(model.names):
+            text = model.text(name)
+            tip = model.toolTip(name)
+            self.fields.append((text.lower(), name.lower(), tip.lower()))
+            main = set(words(text) + words(name))
+            extra = set(words(tip)) - main
+            self.words.append((main, extra))
+            for w in main | extra:
+                self.prefix.append((w, row))
+            for w in main:
+                rowsByWord.setdefault(w, []).append(row)
+            self.prefix.append((name.lower(), row))
+            rowGrams = trigrams(text) | trigrams(name)
+            self.rowGrams.append(rowGrams)
+            for g in rowGrams:
+                grams.setdefault(g, []).append(row)
+        self.prefix.sort()
+        self.grams = grams
+        nearWords = {}
+        for w in rowsByWord:
+            if len(w) >= self.near:
+                for key in deletions(w):
+                    nearWords.setdefault(key, []).append(w)
+        self.rowsByWord = rowsByWord
+        self.nearWords = nearWords
+
+    def prefixRange(self, word):
+        """Range of the sorted word list starting with word."""
+        lo = bisect.bisect_left(self.prefix, (word,))
+        hi = bisect.bisect_left(self.prefix, (word + u"\uffff",))
+        return (hi - lo, lo, hi)
+
+    def candidates(self, query, terms):
+        """Rows with a word starting with the least common query word or
+           a command name starting with the query, and fuzzy matches
+           sharing two thirds of the query trigrams or matching every
+           query word within one edit. Returns a dictionary of row and
+           fuzzy score."""
+        found = {}
+        ranges = [self.prefixRange(query)]
+        if terms:
+            ranges.append(min(self.prefixRange(w) for w in terms))
+        for size, lo, hi in ranges:
+            for i in range(lo, hi):
+                found[self.prefix[i][1]] = 0
+        grams = trigrams(query)
+        if len(found) >= self.fuzzy or len(query) < 3 or not grams:
+            return found
+        for row, score in self.nearRows(terms).items():
+            found[row] = score
+        need = (2 * len(grams) + 2) // 3
+        rare = sorted(grams, key=lambda g: len(self.grams.get(g, ())))
+        seen = set(found)
+        for g in rare[:len(grams) - need + 1]:
+            for row in self.grams.get(g, ()):
+                if row not in seen:
+                    seen.add(row)
+                    shared = len(grams & self.rowGrams[row])
+                    if shared >= need:
+                        found[row] = 20 * shared // len(grams)
+        return found
+
+    def nearRows(self, terms):
+        """Rows matching every query word, by prefix or within one edit
+           of a word of text and name, if at least one word needs the
+           edit. Words score 6 equal, 4 prefix, 3 transposed and 2 for
+           other edits, scaled to the fuzzy range."""
+        if not terms:
+            return {}
+        matches = []
+        edited = False
+        for q in terms:
+            rows = {}
+            if len(q) >= self.near:
+                letters = sorted(q)
+                for key in deletions(q):
+                    for w in self.nearWords.get(key, ()):
+                        score = 3 if sorted(w) == letters else 2
+                        for row in self.rowsByWord[w]:
+                            rows[row] = max(score, rows.get(row, 0))
+                edited = edited or bool(rows)
+            size, lo, hi = self.prefixRange(q)
+            for i in range(lo, hi):
+                w, row = self.prefix[i]
+                rows[row] = 6 if w == q else max(4, rows.get(row, 0))
+            if not rows:
+                return {}
+            matches.append(rows)
+        if not edited:
+            return {}
+        matches.sort(key=len)
+        scored = {}
+        for row in matches[0]:
+            total = 0
+            for rows in matches:
+                if row not in rows:
+                    break
+                total += rows[row]
+            else:
+                scored[row] = 1 + 18 * total // (6 * len(matches))
+        return scored
+
+    def rank(self, row, query, terms, fuzzy):
+        """Score of the row, higher is better."""
+        text, name, tip = self.fields[row]
+        if text == query or name == query:
+            return 100
+        elif text.startswith(query):
+            return 80
+        elif name.startswith(query):
+            return 70
+        elif (" " + query) in text:
+            return 60
+        elif query in text:
+            return 50
+        elif query in name:
+            return 40
+        main, extra = self.words[row]
+        inMain = 0
+        inAny = 0
+        for q in terms:
+            if any(w.startswith(q) for w in main):
+                inMain += 1
+                inAny += 1
+            elif any(w.startswith(q) for w in extra):
+                inAny += 1
+        if terms and inMain == len(terms):
+            return 35
+        elif query in tip:
+            return 30
+        elif terms and inAny == len(terms):
+            return 25
+        return fuzzy
+
+    def find(self, text):
+        """Ranked list of matching rows, None for an empty query."""
+        query = text.strip().lower()
+        if not query:
+            return None
+        terms = words(text)
+        scored = []
+        for row, fuzzy in self.candidates(query, terms).items():
+            score = self.rank(row, query, terms, fuzzy)
+            if score:
+                scored.append((-score, row))
+        scored.sort()
+        return [row for score, row in scored]
+
+
+class SearchModel(QtCore.QAbstractProxyModel):
+    """Ranked search results over a CommandModel. The index is built on
+       the first query after the source model is reset."""
+
+    def __init__(self, source, parent=None):
+        super(SearchModel, self).__init__(parent)
+        self.search = SearchIndex()
+        self.stale = True
+        self.query = ""
+        self.rows = None
+        self.reverse = None
+        self.setSourceModel(source)
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self.onSourceReset)
+
+    def onSourceReset(self):
+        """Mark the index stale and repeat the query."""
+        self.stale = True
+        self.rows = self.results(self.query)
+        self.reverse = None
+        self.endResetModel()
+
+    def results(self, text):
+        """Ranked source rows for text, None for empty text. The index
+           is rebuilt first if stale."""
+        if not text.strip():
+            return None
+        if self.stale:
+            self.search.build(self.sourceModel())
+            self.stale = False
+        return self.search.find(text)
+
+    def setQuery(self, text):
+        """Show ranked results for text, all rows for empty text."""
+        if text == self.query:
+            return
+        self.beginResetModel()
+        self.query = text
+        self.rows = self.results(text)
+        self.reverse = None
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Number of results."""
+        if parent.isValid():
+            return 0
+        if self.rows is None:
+            return self.sourceModel().rowCount()
+        return len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """Single column."""
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column=0, parent=QtCore.QModelIndex()):
+        """Index of a result row."""
+        if parent.isValid() or column != 0:
+            return QtCore.QModelIndex()
+        if not 0 <= row < self.rowCount():
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QtCore.QModelIndex()):
+        """Flat list, no parents."""
+        return QtCore.QModelIndex()
+
+    def mapToSource(self, index):
+        """Source index of a result."""
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        row = index.row()
+        if self.rows is not None:
+            row = self.rows[row]
+        return self.sourceModel().index(row)
+
+    def mapFromSource(self, index):
+        """Result index of a source row, invalid if not matched."""
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        if self.rows is None:
+            return self.index(index.row())
+        if self.reverse is None:
+            self.reverse = dict((r, i) for i, r in enumerate(self.rows))
+        row = self.reverse.get(index.row())
+        if row is None:
+            return QtCore.QModelIndex()
+        return self.index(row)
@@ -21,25 +21,315 @@
 """Cube menu for FreeCAD - Preferences."""
 
 
-import os
 import FreeCADGui as Gui
 import FreeCAD as App
 from PySide import QtGui
 from PySide import QtCore
 import CubeMenuCommon as cpc
-import CubeMenuToolbars as cpt
+import CubeMenuIcons as cpi
+import CubeMenuModels as cpm
+import CubeMenuCatalog as cpcat
 
 
 p = cpc.p
 mw = Gui.getMainWindow()
-path = os.path.dirname(__file__) + "/Resources/icons/"
 pCube = App.ParamGet("User parameter:BaseApp/Preferences/NaviCube")
 
 cBoxWb = None
 cBoxMenu = None
 enabled = None
+enabledModel = None
+session = None
+cubeWriter = None
+optionWriter = None
 copyDomain = None
 editContext = None
+instance = None
+refreshers = []
+pages = {}
+hidden = {"revision": None, "cube": 0}
+cubeChanges = {"count": 0}
+styleLoaders = []
+
+# NaviCube parameters: name: (type, enable option)
+cubeParams = {
+    "ShowCS": ("Bool", None),
+    "CubeSize": ("Int", "EnableSize"),
+    "OffsetX": ("Int", "EnableOffsetX"),
+    "OffsetY": ("Int", "EnableOffsetY"),
+    "FrontColor": ("Unsigned", "EnableFrontColor"),
+    "BackColor": ("Unsigned", "EnableBackColor"),
+    "HiliteColor": ("Unsigned", "EnableHiliteColor"),
+    "ButtonColor": ("Unsigned", "EnableButtonColor"),
+    "TextColor": ("Unsigned", "EnableTextColor"),
+    "FontWeight": ("Int", "EnableTextWeight"),
+    "FontStretch": ("Int", "EnableTextStretch"),
+    "FontString": ("String", "EnableFontString"),
+    "TextFront": ("String", "EnableTextFront"),
+    "TextRear": ("String", "EnableTextRear"),
+    "TextTop": ("String", "EnableTextTop"),
+    "TextBottom": ("String", "EnableTextBottom"),
+    "TextLeft": ("String", "EnableTextLeft"),
+    "TextRight": ("String", "EnableTextRight")}
+
+# Value ranges of the NaviCube parameters, as allowed by the settings
+cubeRanges = {
+    "Int": (-2 ** 31, 2 ** 31 - 1),
+    "Unsigned": (0, 0xFFFFFFFF),
+    "CubeSize": (1, 10000),
+    "OffsetX": (0, 10000),
+    "OffsetY": (0, 10000),
+    "FontWeight": (1, 99),
+    "FontStretch": (1, 1000)}
+
+
+class CubeObserver(object):
+    """Count NaviCube parameter changes."""
+
+    def OnChange(self, grp, reason):
+        """Parameter changed."""
+        cubeChanges["count"] += 1
+
+
+class EditSession(QtCore.QObject):
+    """Edits of enabled commands. Each change is recorded in a journal
+       of the menu for undo and redo, parameter writes are coalesced and
+       flushed once edits pause or the dialog closes."""
+
+    def __init__(self, parent=None, delay=500, depth=100):
+        super(EditSession, self).__init__(parent)
+        self.depth = depth
+        self.state = {}
+        self.journals = {}
+        self.dirty = {}
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.flush)
+
+    def load(self, domain, items):
+        """Start editing menu commands, drop the journal if the menu
+           changed outside the session."""
+        if self.state.get(domain) != items:
+            self.journals.pop(domain, None)
+        self.state[domain] = list(items)
+
+    def change(self, domain, items, row):
+        """Record new menu commands and the selected row."""
+        before = self.state.get(domain, [])
+        if before == items:
+            return
+        undo, redo = self.journals.setdefault(domain, ([], []))
+        undo.append((before, list(items), row))
+        del undo[:-self.depth]
+        del redo[:]
+        self.write(domain, items)
+
+    def undo(self, domain):
+        """Undo last change, return (commands, row) or None."""
+        undo, redo = self.journals.get(domain, ([], []))
+        if not undo:
+            return None
+        before, after, row = undo.pop()
+        redo.append((before, after, row))
+        self.write(domain, before)
+        return before, row
+
+    def redo(self, domain):
+        """Redo last undone change, return (commands, row) or None."""
+        undo, redo = self.journals.get(domain, ([], []))
+        if not redo:
+            return None
+        before, after, row = redo.pop()
+        undo.append((before, after, row))
+        self.write(domain, after)
+        return after, row
+
+    def write(self, domain, items):
+        """Schedule parameter write."""
+        self.state[domain] = list(items)
+        self.dirty[domain] = self.state[domain]
+        self.timer.start()
+
+    def flush(self):
+        """Write pending changes to parameters."""
+        self.timer.stop()
+        dirty = self.dirty
+        self.dirty = {}
+        for domain in dirty:
+            g = cpc.findGroup(domain)
+            if g:
+                g.SetString("commands", ",".join(dirty[domain]))
+
+
+class SettingsWriter(QtCore.QObject):
+    """Staged writes to a parameter group. Changes are committed together
+       once edits pause, on focus-out or when the dialog closes. Reads
+       return staged values first."""
+
+    defaults = {"Bool": False, "Int": 0, "Unsigned": 0, "String": ""}
+
+    def __init__(self, group, parent=None, delay=300):
+        super(SettingsWriter, self).__init__(parent)
+        self.group = group
+        self.staged = {}
+        self.commits = 0
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.flush)
+
+    def get(self, kind, name, *default):
+        """Staged or stored value of the parameter."""
+        key = (kind, name)
+        if key in self.staged:
+            value = self.staged[key]
+            if value is not None:
+                return value
+            return default[0] if default else self.defaults[kind]
+        return getattr(self.group, "Get" + kind)(name, *default)
+
+    def set(self, kind, name, value):
+        """Stage parameter value."""
+        self.staged[(kind, name)] = value
+        self.timer.start()
+
+    def remove(self, kind, name):
+        """Stage parameter removal."""
+        self.set(kind, name, None)
+
+    def flush(self):
+        """Write staged changes to the parameter group."""
+        self.timer.stop()
+        staged = self.staged
+        self.staged = {}
+        if not staged:
+            return
+        for (kind, name), value in staged.items():
+            if value is None:
+                getattr(self.group, "Rem" + kind)(name)
+            else:
+                getattr(self.group, "Set" + kind)(name, value)
+        self.commits += 1
+
+
+def writer():
+    """NaviCube parameters writer."""
+    global cubeWriter
+    if cubeWriter is None:
+        cubeWriter = SettingsWriter(pCube, mw)
+    return cubeWriter
+
+
+def options():
+    """Cube menu settings options writer."""
+    global optionWriter
+    if optionWriter is None:
+        optionWriter = SettingsWriter(p, mw)
+    return optionWriter
+
+
+def validValue(name, value):
+    """Check the type and range of a NaviCube parameter value."""
+    kind = cubeParams[name][0]
+    if kind == "String":
+        return isinstance(value, (str, type(u"")))
+    if kind == "Bool":
+        return isinstance(value, (bool, int))
+    if isinstance(value, bool) or not isinstance(value, (int, type(2 ** 64))):
+        return False
+    low, high = cubeRanges.get(name, cubeRanges[kind])
+    return low <= value <= high
+
+
+def applyPreset(preset):
+    """Write a navigation cube style in one go. Preset maps NaviCube
+       parameter names to values, None restores the default value.
+       Settings options of the preset parameters are enabled. Raises
+       ValueError for unknown parameter names or invalid values, before
+       writing any."""
+    unknown = [name for name in preset if name not in cubeParams]
+    if unknown:
+        raise ValueError("Unknown NaviCube parameters: " +
+                         ", ".join(sorted(unknown)))
+    invalid = [name for name, value in preset.items()
+               if value is not None and not validValue(name, value)]
+    if invalid:
+        raise ValueError("Invalid NaviCube parameter values: " +
+                         ", ".join(sorted(invalid)))
+    cube = writer()
+    option = options()
+    for name, value in preset.items():
+        kind, enable = cubeParams[name]
+        if value is None:
+            cube.remove(kind, name)
+            if enable:
+                option.remove("Bool", enable)
+        else:
+            cube.set(kind, name, value)
+            if enable:
+                option.set("Bool", enable, 1)
+    cube.flush()
+    option.flush()
+    for load in styleLoaders:
+        load()
+
+
+def showDialog():
+    """Show the preferences dialog. The dialog is created on first use
+       and hidden on close, later uses refresh what changed meanwhile."""
+    global instance
+    if instance is None:
+        pCube.Attach(CubeObserver())
+        createWidgets()
+        instance = dialog()
+        cpcat.schedule()
+    else:
+        for refresh in refreshers:
+            refresh()
+    instance.show()
+    return instance
+
+
+def showPage(stack, n):
+    """Show stack page, build it in place of its placeholder on first
+       use."""
+    build = pages.pop(n, None)
+    if build:
+        placeholder = stack.widget(n)
+        stack.removeWidget(placeholder)
+        stack.insertWidget(n, build())
+        placeholder.deleteLater()
+    stack.setCurrentIndex(n)
+
+
+def paramsChanged():
+    """Check if parameters changed while the dialog was hidden."""
+    return (hidden["revision"] != cpc.paramRevision() or
+            hidden["cube"] != cubeChanges["count"])
+
+
+def defaultWb():
+    """Workbench to select when the dialog opens."""
+    if p.GetBool("Global", 0):
+        return "GlobalPanel"
+    return Gui.activeWorkbench().__class__.__name__
+
+
+def loadOption(ck, checked, widget=None):
+    """Set check box and enable its value widget, without signals."""
+    ck.blockSignals(True)
+    ck.setChecked(checked)
+    ck.blockSignals(False)
+    if widget:
+        widget.setEnabled(checked)
+
+
+def loadValue(spin, value):
+    """Set spin box value, without signals."""
+    spin.blockSignals(True)
+    spin.setValue(value)
+    spin.blockSignals(False)
 
 
 def createWidgets():
@@ -53,28 +343,42 @@ def createWidgets():
     cBoxMenu.setSizePolicy(QtGui.QSizePolicy.Expanding,
                            QtGui.QSizePolicy.Preferred)
     global enabled
-    enabled = QtGui.QListWidget()
+    global enabledModel
+    enabled = QtGui.QListView()
+    enabled.setUniformItemSizes(True)
+    enabledModel = cpm.EnabledModel(enabled)
+    enabled.setModel(enabledModel)
+    global session
+    session = EditSession(enabled)
 
 
 def baseGroup():
     """Current workbench base group."""
     wb = cBoxWb.itemData(cBoxWb.currentIndex(), QtCore.Qt.UserRole)
-    g = p.GetGroup("User").GetGroup(wb)
+    g = cpc.workbenchGroup("User", wb)
     return g
 
 
+def enabledCommand():
+    """Command name of the current enabled row or None."""
+    return enabled.currentIndex().data(QtCore.Qt.UserRole)
+
+
+def setEnabledRow(row):
+    """Select enabled row."""
+    enabled.setCurrentIndex(enabledModel.index(row))
+
+
 def saveEnabled():
-    """Save enabled on change."""
-    items = []
-    for index in range(enabled.count()):
-        items.append(enabled.item(index).data(QtCore.Qt.UserRole))
+    """Record enabled change in the edit session."""
     domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
     if domain:
-        g = cpc.findGroup(domain)
-        if g:
-            g.SetString("commands", ",".join(items))
+        session.change(domain,
+                       enabledModel.commands(),
+                       enabled.currentIndex().row())
 
 
+@cpc.timed("dialog")
 def dialog():
     """Cube menu preferences dialog."""
 
@@ -83,8 +387,20 @@ def dialog():
         dia.done(1)
 
     def onFinished():
-        """ Delete dialog on close."""
-        dia.deleteLater()
+        """Write pending edits and remember parameters state when the
+           dialog is hidden."""
+        session.flush()
+        writer().flush()
+        hidden["revision"] = cpc.paramRevision()
+        hidden["cube"] = cubeChanges["count"]
+
+    def onRefresh():
+        """Return to general preferences on reuse."""
+        global copyDomain
+        copyDomain = None
+        stack.setCurrentIndex(0)
+        btnClose.setDefault(True)
+        btnClose.setFocus()
 
     # Dialog
     dia = QtGui.QDialog(mw)
@@ -106,7 +422,7 @@ def dialog():
 
     def onSettings():
         """Stack widget index change."""
-        stack.setCurrentIndex(2)
+        showPage(stack, 2)
 
     btnSettings.clicked.connect(onSettings)
 
@@ -118,11 +434,7 @@ def dialog():
         """Return to general preferences."""
         btnSettings.clearFocus()
         stack.setCurrentIndex(0)
-        if p.GetBool("Global", 0):
-            cBoxWb.setCurrentIndex(cBoxWb.findData("GlobalPanel"))
-        else:
-            activeWb = Gui.activeWorkbench().__class__.__name__
-            cBoxWb.setCurrentIndex(cBoxWb.findData(activeWb))
+        cBoxWb.setCurrentIndex(cBoxWb.findData(defaultWb()))
 
     btnSettingsDone.clicked.connect(onBtnSettingsDone)
 
@@ -131,16 +443,30 @@ def dialog():
     btnClose.setToolTip("Close the preferences dialog")
     btnClose.clicked.connect(onAccepted)
 
+    def buildEdit():
+        """Build edit page."""
+        return edit(stack)
+
+    def buildSettings():
+        """Build settings page."""
+        return settings(stack, btnSettingsDone)
+
+    # Edit and settings pages are built on first use
     stack.insertWidget(0, general(dia, stack, btnClose, btnSettings))
-    stack.insertWidget(1, edit(stack))
-    stack.insertWidget(2, settings(stack, btnSettingsDone))
+    stack.insertWidget(1, QtGui.QWidget())
+    stack.insertWidget(2, QtGui.QWidget())
+    pages[1] = buildEdit
+    pages[2] = buildSettings
 
     btnClose.setDefault(True)
     btnClose.setFocus()
 
+    refreshers.insert(0, onRefresh)
+
     return dia
 
 
+@cpc.timed("general")
 def general(dia, stack, btnClose, btnSettings):
     """General command panel preferences."""
 
@@ -153,14 +479,25 @@ def general(dia, stack, btnClose, btnSettings):
     search = QtGui.QLineEdit()
 
     # Available commands
-    commands = QtGui.QListWidget()
-    commands.setSortingEnabled(True)
-    commands.sortItems(QtCore.Qt.AscendingOrder)
+    commands = QtGui.QListView()
+    commands.setUniformItemSizes(True)
+    commandModel = cpm.CommandModel(commands)
+    searchModel = cpm.SearchModel(commandModel, commands)
+    commands.setModel(searchModel)
+
+    # Search delay
+    searchTimer = QtCore.QTimer(w)
+    searchTimer.setSingleShot(True)
+    searchTimer.setInterval(150)
+
+    # Activate workbench
+    btnActivateWb = QtGui.QPushButton("Activate")
+    btnActivateWb.setToolTip("Activate workbench to record its commands")
 
     # Reset workbench
     btnResetWb = QtGui.QPushButton()
     btnResetWb.setToolTip("Reset workbench to defaults")
-    btnResetWb.setIcon(QtGui.QIcon(path + "CommandPanelReset.svg"))
+    btnResetWb.setIcon(cpi.fileIcon("CommandPanelReset.svg"))
 
     # Checkbox default menu
     ckDefault = QtGui.QCheckBox()
@@ -169,60 +506,58 @@ def general(dia, stack, btnClose, btnSettings):
     # Button add workbench menu
     btnAddWbMenu = QtGui.QPushButton()
     btnAddWbMenu.setToolTip("Add new workbench menu")
-    btnAddWbMenu.setIcon(QtGui.QIcon(path + "CommandPanelAdd.svg"))
+    btnAddWbMenu.setIcon(cpi.fileIcon("CommandPanelAdd.svg"))
 
     # Button remove workbench menu
     btnRemoveWbMenu = QtGui.QPushButton()
     btnRemoveWbMenu.setToolTip("Remove selected workbench menu")
-    btnRemoveWbMenu.setIcon(QtGui.QIcon(path + "CommandPanelRemove.svg"))
+    btnRemoveWbMenu.setIcon(cpi.fileIcon("CommandPanelRemove.svg"))
 
     # Button copy workbench menu
     btnCopyWbMenu = QtGui.QPushButton()
     btnCopyWbMenu.setToolTip("Copy existing workbench menu")
-    btnCopyWbMenu.setIcon(QtGui.QIcon(path + "CommandPanelCopy.svg"))
+    btnCopyWbMenu.setIcon(cpi.fileIcon("CommandPanelCopy.svg"))
 
     # Button rename workbench menu
     btnRenameWbMenu = QtGui.QPushButton()
     btnRenameWbMenu.setToolTip("Rename selected workbench menu")
-    btnRenameWbMenu.setIcon(QtGui.QIcon(path + "CommandPanelRename.svg"))
+    btnRenameWbMenu.setIcon(cpi.fileIcon("CommandPanelRename.svg"))
 
     # Button add command
     btnAddCommand = QtGui.QPushButton()
     btnAddCommand.setToolTip("Add selected command")
-    btnAddCommand.setIcon(QtGui.QIcon(path + "CommandPanelAddCommand.svg"))
+    btnAddCommand.setIcon(cpi.fileIcon("CommandPanelAddCommand.svg"))
 
     # Button remove command
     btnRemoveCommand = QtGui.QPushButton()
     btnRemoveCommand.setToolTip("Remove selected command")
-    btnRemoveCommand.setIcon(QtGui.QIcon(path +
-                                         "CommandPanelRemoveCommand.svg"))
+    btnRemoveCommand.setIcon(cpi.fileIcon("CommandPanelRemoveCommand.svg"))
 
     # Button move up
     btnMoveUp = QtGui.QPushButton()
     btnMoveUp.setToolTip("Move selected command up")
-    btnMoveUp.setIcon(QtGui.QIcon(path + "CommandPanelUp.svg"))
+    btnMoveUp.setIcon(cpi.fileIcon("CommandPanelUp.svg"))
 
     # Button move down
     btnMoveDown = QtGui.QPushButton()
     btnMoveDown.setToolTip("Move selected command down")
-    btnMoveDown.setIcon(QtGui.QIcon(path + "CommandPanelDown.svg"))
+    btnMoveDown.setIcon(cpi.fileIcon("CommandPanelDown.svg"))
 
     # Button add separator
     btnAddSeparator = QtGui.QPushButton()
     btnAddSeparator.setToolTip("Add separator")
-    btnAddSeparator.setIcon(QtGui.QIcon(path +
-                                        "CommandPanelAddSeparator.svg"))
+    btnAddSeparator.setIcon(cpi.fileIcon("CommandPanelAddSeparator.svg"))
 
     # Button add menu
     btnAddMenu = QtGui.QPushButton()
     btnAddMenu.setToolTip("Add menu")
-    btnAddMenu.setIcon(QtGui.QIcon(path + "CommandPanelAddMenu.svg"))
+    btnAddMenu.setIcon(cpi.fileIcon("CommandPanelAddMenu.svg"))
 
     # Button edit menu
     btnEditMenu = QtGui.QPushButton()
     btnEditMenu.setEnabled(False)
     btnEditMenu.setToolTip("Edit menu")
-    btnEditMenu.setIcon(QtGui.QIcon(path + "CommandPanelEditMenu.svg"))
+    btnEditMenu.setIcon(cpi.fileIcon("CommandPanelEditMenu.svg"))
 
     # Layout
     loPanels = QtGui.QHBoxLayout()
@@ -236,6 +571,7 @@ def general(dia, stack, btnClose, btnSettings):
 
     loCBoxWb = QtGui.QHBoxLayout()
     loCBoxWb.addWidget(cBoxWb)
+    loCBoxWb.addWidget(btnActivateWb)
     loCBoxWb.addWidget(btnResetWb)
 
     loCBoxMenu = QtGui.QHBoxLayout()
@@ -271,45 +607,50 @@ def general(dia, stack, btnClose, btnSettings):
 
     # Functions and connections
 
-    def onSearch(text):
-        """Show or hide commands on search."""
-        for index in range(commands.count()):
-            if text.lower() in commands.item(index).text().lower():
-                commands.item(index).setHidden(False)
-            else:
-                commands.item(index).setHidden(True)
+    def onSearch():
+        """Show ranked commands matching the search text."""
+        searchModel.setQuery(search.text())
+        commands.setCurrentIndex(searchModel.index(0))
+
+    searchTimer.timeout.connect(onSearch)
 
-    search.textEdited.connect(onSearch)
+    def onSearchEdited():
+        """Search after typing pauses."""
+        searchTimer.start()
+
+    search.textEdited.connect(onSearchEdited)
 
     def populateCommands():
-        """Populate available commands panel."""
-        actions = cpc.actionList()
-        commands.blockSignals(True)
-        commands.clear()
-        for i in actions:
-            item = QtGui.QListWidgetItem(commands)
-            item.setText(actions[i].text().replace("&", ""))
-            item.setToolTip(actions[i].toolTip())
-            icon = actions[i].icon()
-            if icon.isNull():
-                item.setIcon(QtGui.QIcon(":/icons/freecad"))
-            else:
-                item.setIcon(icon)
-            item.setData(QtCore.Qt.UserRole, actions[i].objectName())
-        commands.setCurrentRow(0)
-        commands.blockSignals(False)
+        """Populate available commands panel. Commands of a workbench
+           that is not active come from the catalog, if recorded."""
+        wb = cBoxWb.itemData(cBoxWb.currentIndex(), QtCore.Qt.UserRole)
+        active = Gui.activeWorkbench().__class__.__name__
+        entries = None
+        source = None
+        if wb not in ("GlobalPanel", active):
+            btnActivateWb.setEnabled(True)
+            entries = cpcat.commands(wb)
+            if entries is not None:
+                source = (wb, cpcat.revision())
+        else:
+            btnActivateWb.setEnabled(False)
+        if commandModel.refresh(entries, source):
+            commands.setCurrentIndex(searchModel.index(0))
+
+    seen = {"workbenches": None}
 
     def populateCBoxWb():
         """Workbench selector combo box."""
         wb = Gui.listWorkbenches()
         wbSort = list(wb)
         wbSort.sort()
+        seen["workbenches"] = list(wbSort)
         wbSort.reverse()
         cBoxWb.blockSignals(True)
         cBoxWb.clear()
         for i in wbSort:
             try:
-                icon = cpc.wbIcon(wb[i].Icon)
+                icon = cpi.wbIcon(wb[i].Icon)
             except AttributeError:
                 icon = QtGui.QIcon(":/icons/freecad")
             mt = wb[i].MenuText
@@ -320,22 +661,12 @@ def general(dia, stack, btnClose, btnSettings):
                           QtGui.QIcon(":/icons/freecad"),
                           "Global menu",
                           "GlobalPanel")
-        if p.GetBool("Global", 0):
-            cBoxWb.setCurrentIndex(cBoxWb.findData("GlobalPanel"))
-        else:
-            activeWb = Gui.activeWorkbench().__class__.__name__
-            cBoxWb.setCurrentIndex(cBoxWb.findData(activeWb))
+        cBoxWb.setCurrentIndex(cBoxWb.findData(defaultWb()))
         cBoxWb.blockSignals(False)
 
     def onCBoxWb():
-        """Activate workbench on selection."""
+        """Load workbench menus and commands on selection."""
         base = baseGroup()
-        wb = Gui.listWorkbenches()
-        current = cBoxWb.itemData(cBoxWb.currentIndex(),
-                                  QtCore.Qt.UserRole)
-        for i in wb:
-            if wb[i].__class__.__name__ == current:
-                Gui.activateWorkbench(i)
         cpc.defaultGroup(base)
         populateCommands()
         populateCBoxMenu()
@@ -346,17 +677,27 @@ def general(dia, stack, btnClose, btnSettings):
 
     cBoxWb.currentIndexChanged.connect(onCBoxWb)
 
+    def onBtnActivateWb():
+        """Activate the selected workbench."""
+        wb = Gui.listWorkbenches()
+        current = cBoxWb.itemData(cBoxWb.currentIndex(),
+                                  QtCore.Qt.UserRole)
+        for i in wb:
+            if wb[i].__class__.__name__ == current:
+                Gui.activateWorkbench(i)
+        populateCommands()
+        btnClose.setFocus()
+
+    btnActivateWb.clicked.connect(onBtnActivateWb)
+
     def populateCBoxMenu():
         """Workbench menu combo box."""
         base = baseGroup()
-        index = cpc.splitIndex(base)
+        wb = cBoxWb.itemData(cBoxWb.currentIndex(), QtCore.Qt.UserRole)
         ckDefault.blockSignals(True)
         cBoxMenu.blockSignals(True)
         cBoxMenu.clear()
-        for i in index:
-            name = base.GetGroup(i).GetString("name")
-            uid = base.GetGroup(i).GetString("uuid")
-            wb = cBoxWb.itemData(cBoxWb.currentIndex(), QtCore.Qt.UserRole)
+        for uid, name in cpc.menuList("User", wb):
             domain = "CPMenu" + "." + "User" + "." + wb + "." + uid
             try:
                 cBoxMenu.insertItem(0, name.decode("UTF-8"), domain)
@@ -392,6 +733,7 @@ def general(dia, stack, btnClose, btnSettings):
         """Reset workbench to defaults."""
         base = baseGroup()
         base.Clear()
+        cpc.forget("User." + cBoxWb.itemData(cBoxWb.currentIndex()), True)
         cpc.defaultGroup(base)
         populateCBoxMenu()
         domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
@@ -489,6 +831,7 @@ def general(dia, stack, btnClose, btnSettings):
 
     def populateEnabled(group):
         """Populate enabled commands panel."""
+        session.flush()
         if group:
             items = group.GetString("commands")
         else:
@@ -497,123 +840,101 @@ def general(dia, stack, btnClose, btnSettings):
             items = items.split(",")
         else:
             items = []
-        actions = cpc.actionList()
+        domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
+        if domain:
+            session.load(domain, items)
         enabled.blockSignals(True)
-        enabled.clear()
-        for i in items:
-            item = QtGui.QListWidgetItem(enabled)
-            if i == "CPSeparator":
-                item.setText("Separator")
-                item.setData(QtCore.Qt.UserRole, i)
-                item.setIcon(QtGui.QIcon(path +
-                                         "CommandPanelAddSeparator.svg"))
-            elif i.startswith("CPMenu"):
-                g = cpc.findGroup(i)
-                if g:
-                    try:
-                        text = g.GetString("name").decode("UTF-8")
-                    except AttributeError:
-                        text = g.GetString("name")
-                    item.setText("Menu: " + text)
-                else:
-                    item.setText("Menu")
-                item.setData(QtCore.Qt.UserRole, i)
-                item.setIcon(QtGui.QIcon(path + "CommandPanelAddMenu.svg"))
-            elif i in actions:
-                item.setText(actions[i].text().replace("&", ""))
-                item.setToolTip(actions[i].toolTip())
-                icon = actions[i].icon()
-                if icon.isNull():
-                    item.setIcon(QtGui.QIcon(":/icons/freecad"))
-                else:
-                    item.setIcon(icon)
-                item.setData(QtCore.Qt.UserRole, i)
-            else:
-                item.setText(i)
-                item.setToolTip("Command " + i + " is not currently available")
-                icon = QtGui.QIcon()
-                icon.addPixmap(QtGui.QPixmap(":/icons/freecad"))
-                item.setIcon(QtGui.QIcon(icon.pixmap(256,
-                                                     QtGui.QIcon.Disabled)))
-                item.setData(QtCore.Qt.UserRole, i)
-        enabled.setCurrentRow(0)
+        enabledModel.setCommands(items)
+        setEnabledRow(0)
         enabled.blockSignals(False)
         onSelectionChanged()
 
+    def restoreEnabled(result):
+        """Show commands restored by undo or redo."""
+        if result:
+            items, row = result
+            enabledModel.setCommands(items)
+            setEnabledRow(min(row, len(items) - 1))
+            onSelectionChanged()
+
+    def onUndo():
+        """Undo last enabled commands change."""
+        domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
+        if domain:
+            restoreEnabled(session.undo(domain))
+
+    def onRedo():
+        """Redo last undone enabled commands change."""
+        domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
+        if domain:
+            restoreEnabled(session.redo(domain))
+
+    for key, function in (("Ctrl+Z", onUndo),
+                          ("Ctrl+Y", onRedo),
+                          ("Ctrl+Shift+Z", onRedo)):
+        shortcut = QtGui.QShortcut(QtGui.QKeySequence(key), w)
+        shortcut.setContext(QtCore.Qt.WidgetWithChildrenShortcut)
+        shortcut.activated.connect(function)
+
     def onBtnAddCommand():
         """Add the selected command."""
-        row = enabled.currentRow()
-        data = commands.currentItem().data(QtCore.Qt.UserRole)
-        item = QtGui.QListWidgetItem()
-        enabled.insertItem(row + 1, item)
-        enabled.setCurrentRow(row + 1)
-        item.setText(commands.currentItem().text().replace("&", ""))
-        item.setToolTip(commands.currentItem().toolTip())
-        item.setIcon(commands.currentItem().icon())
-        item.setData(QtCore.Qt.UserRole, data)
-        saveEnabled()
+        data = commands.currentIndex().data(QtCore.Qt.UserRole)
+        if data:
+            row = enabled.currentIndex().row()
+            enabledModel.insertCommand(row + 1, data)
+            setEnabledRow(row + 1)
+            saveEnabled()
 
     btnAddCommand.clicked.connect(onBtnAddCommand)
-    commands.itemDoubleClicked.connect(onBtnAddCommand)
+    commands.doubleClicked.connect(onBtnAddCommand)
 
     def onBtnRemoveCommand():
         """Remove the selected command."""
-        row = enabled.currentRow()
-        item = enabled.takeItem(row)
-        if item:
-            del item
-            if row == enabled.count():
-                enabled.setCurrentRow(row - 1)
+        row = enabled.currentIndex().row()
+        if row != -1:
+            enabledModel.removeCommand(row)
+            if row == enabledModel.rowCount():
+                setEnabledRow(row - 1)
             else:
-                enabled.setCurrentRow(row)
+                setEnabledRow(row)
             saveEnabled()
 
     btnRemoveCommand.clicked.connect(onBtnRemoveCommand)
 
     def onBtnMoveUp():
         """Move selected command up."""
-        row = enabled.currentRow()
-        if row != 0:
-            item = enabled.takeItem(row)
-            enabled.insertItem(row - 1, item)
-            enabled.setCurrentRow(row - 1)
+        row = enabled.currentIndex().row()
+        if row > 0:
+            enabledModel.moveCommand(row, row - 1)
+            setEnabledRow(row - 1)
             saveEnabled()
 
     btnMoveUp.clicked.connect(onBtnMoveUp)
 
     def onBtnMoveDown():
         """Move selected command down."""
-        row = enabled.currentRow()
-        if row != enabled.count() - 1 and row != -1:
-            item = enabled.takeItem(row)
-            enabled.insertItem(row + 1, item)
-            enabled.setCurrentRow(row + 1)
+        row = enabled.currentIndex().row()
+        if row != enabledModel.rowCount() - 1 and row != -1:
+            enabledModel.moveCommand(row, row + 1)
+            setEnabledRow(row + 1)
             saveEnabled()
 
     btnMoveDown.clicked.connect(onBtnMoveDown)
 
     def onBtnAddSeparator():
         """Add separator."""
-        row = enabled.currentRow()
-        item = QtGui.QListWidgetItem()
-        enabled.insertItem(row + 1, item)
-        enabled.setCurrentRow(row + 1)
-        item.setText("Separator")
-        item.setData(QtCore.Qt.UserRole, "CPSeparator")
-        item.setIcon(QtGui.QIcon(path + "CommandPanelAddSeparator.svg"))
+        row = enabled.currentIndex().row()
+        enabledModel.insertCommand(row + 1, "CPSeparator")
+        setEnabledRow(row + 1)
         saveEnabled()
 
     btnAddSeparator.clicked.connect(onBtnAddSeparator)
 
     def onBtnAddMenu():
         """Add menu."""
-        row = enabled.currentRow()
-        item = QtGui.QListWidgetItem()
-        enabled.insertItem(row + 1, item)
-        enabled.setCurrentRow(row + 1)
-        item.setText("Menu")
-        item.setData(QtCore.Qt.UserRole, "CPMenu")
-        item.setIcon(QtGui.QIcon(path + "CommandPanelAddMenu.svg"))
+        row = enabled.currentIndex().row()
+        enabledModel.insertCommand(row + 1, "CPMenu")
+        setEnabledRow(row + 1)
         saveEnabled()
         onSelectionChanged()
 
@@ -621,33 +942,31 @@ def general(dia, stack, btnClose, btnSettings):
 
     def onSelectionChanged():
         """Set enabled state for widgets on selection changed."""
-        current = enabled.currentItem()
-        if current:
-            data = current.data(QtCore.Qt.UserRole)
-        if current and data and data.startswith("CPMenu"):
+        data = enabledCommand()
+        if data and data.startswith("CPMenu"):
             btnEditMenu.setEnabled(True)
             btnEditMenu.setFocus()
         else:
             btnEditMenu.setEnabled(False)
 
-    enabled.itemSelectionChanged.connect(onSelectionChanged)
+    enabled.selectionModel().selectionChanged.connect(onSelectionChanged)
 
     def onEditMenu():
         """Open edit dialog for selected menu ."""
-        current = enabled.currentItem()
-        if current and current.data(QtCore.Qt.UserRole).startswith("CPMenu"):
+        data = enabledCommand()
+        if data and data.startswith("CPMenu"):
             global editContext
             editContext = "Set"
-            stack.setCurrentIndex(1)
+            showPage(stack, 1)
 
     btnEditMenu.clicked.connect(onEditMenu)
-    enabled.itemDoubleClicked.connect(onEditMenu)
+    enabled.doubleClicked.connect(onEditMenu)
 
     def onCopyWbMenu():
         """Open copy menu dialog."""
         global editContext
         editContext = "Copy"
-        stack.setCurrentIndex(1)
+        showPage(stack, 1)
 
     btnCopyWbMenu.clicked.connect(onCopyWbMenu)
 
@@ -655,11 +974,11 @@ def general(dia, stack, btnClose, btnSettings):
         """Stack widget index change."""
         global copyDomain
         if n == 0:
-            row = enabled.currentRow()
+            row = enabled.currentIndex().row()
             domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
             if domain:
                 populateEnabled(cpc.findGroup(domain))
-            enabled.setCurrentRow(row)
+            setEnabledRow(row)
             btnClose.setDefault(True)
             if copyDomain:
                 populateCBoxMenu()
@@ -671,6 +990,26 @@ def general(dia, stack, btnClose, btnSettings):
 
     stack.currentChanged.connect(onStack)
 
+    def onRefresh():
+        """Refresh workbenches, commands and menus if they changed."""
+        current = cBoxWb.itemData(cBoxWb.currentIndex())
+        if sorted(Gui.listWorkbenches()) != seen["workbenches"]:
+            populateCBoxWb()
+        else:
+            cBoxWb.blockSignals(True)
+            cBoxWb.setCurrentIndex(cBoxWb.findData(defaultWb()))
+            cBoxWb.blockSignals(False)
+        cpc.defaultGroup(baseGroup())
+        populateCommands()
+        if (paramsChanged() or
+                current != cBoxWb.itemData(cBoxWb.currentIndex())):
+            populateCBoxMenu()
+            domain = cBoxMenu.itemData(cBoxMenu.currentIndex())
+            populateEnabled(cpc.findGroup(domain))
+        onSelectionChanged()
+
+    refreshers.append(onRefresh)
+
     # Available workbenches
     populateCBoxWb()
     # Default menu
@@ -685,21 +1024,27 @@ def general(dia, stack, btnClose, btnSettings):
     return w
 
 
+@cpc.timed("edit")
 def edit(stack):
     """Preferences for editable commands."""
 
-    items = []
-
     # Widgets
     widget = QtGui.QWidget()
     layout = QtGui.QVBoxLayout()
     widget.setLayout(layout)
 
-    tree = QtGui.QTreeWidget()
-    if editContext == "Copy":
-        tree.setHeaderLabel("Copy menu: None")
-    else:
-        tree.setHeaderLabel("Set menu: None")
+    # Filter
+    leFilter = QtGui.QLineEdit()
+    leFilter.setPlaceholderText("Filter menus")
+
+    filterTimer = QtCore.QTimer(widget)
+    filterTimer.setSingleShot(True)
+    filterTimer.setInterval(150)
+
+    tree = QtGui.QTreeView()
+    tree.setUniformRowHeights(True)
+    model = cpm.MenuTreeModel(tree)
+    tree.setModel(model)
 
     # Button edit done
     btnEditDone = QtGui.QPushButton()
@@ -711,183 +1056,92 @@ def edit(stack):
     loBtnEditDone.addStretch()
     loBtnEditDone.addWidget(btnEditDone)
 
+    layout.addWidget(leFilter)
     layout.addWidget(tree)
-    layout.insertLayout(1, loBtnEditDone)
+    layout.insertLayout(2, loBtnEditDone)
 
     # Functions and connections
 
+    def expandTree():
+        """Expand the current workbench, or all nodes when filtered."""
+        if model.filter:
+            tree.expandAll()
+            return
+        top = model.index(0)
+        tree.expand(top)
+        for row in range(model.rowCount(top)):
+            tree.expand(model.index(row, 0, top))
+
     def updateTree():
-        """Update tree widget and add available menus."""
-        tree.blockSignals = True
-        wb = Gui.listWorkbenches()
+        """Load available menus, checking the current menu in set mode."""
         currentWb = cBoxWb.itemData(cBoxWb.currentIndex())
-
-        wbSort = list(wb)
-        wbSort.sort()
-        if currentWb in wbSort:
-            wbSort.remove(currentWb)
-
-        def treeItems(currentWb=None,
-                      mt=None,
-                      cn=None,
-                      expanded=False,
-                      itemTop=None):
-            """Create tree widget items."""
-            if currentWb:
-                try:
-                    icon = cpc.wbIcon(wb[currentWb].Icon)
-                except AttributeError:
-                    icon = QtGui.QIcon(":/icons/freecad")
-            else:
-                icon = QtGui.QIcon(":/icons/freecad")
-
-            if not mt:
-                mt = wb[currentWb].MenuText
-            if not cn:
-                cn = wb[currentWb].__class__.__name__
-
-            if itemTop:
-                item = QtGui.QTreeWidgetItem(itemTop)
-            else:
-                item = QtGui.QTreeWidgetItem(tree)
-
-            if cn != "GlobalPanel":
-                item.setIcon(0, icon)
-
-            try:
-                item.setText(0, mt.decode("UTF-8"))
-            except AttributeError:
-                item.setText(0, mt)
-
-            item.setExpanded(expanded)
-
-            source = ["User", "System"]
-            for s in source:
-                itemSource = QtGui.QTreeWidgetItem(item)
-                itemSource.setText(0, s)
-                itemSource.setExpanded(expanded)
-
-                base = p.GetGroup(s).GetGroup(cn)
-                index = cpc.splitIndex(base)
-                for i in index:
-                    g = base.GetGroup(i)
-                    uid = g.GetString("uuid")
-                    domain = "CPMenu" + "." + s + "." + cn + "." + uid
-                    itemMenu = QtGui.QTreeWidgetItem(itemSource)
-                    name = g.GetString("name")
-                    try:
-                        itemMenu.setText(0, name.decode("UTF-8"))
-                    except AttributeError:
-                        itemMenu.setText(0, name)
-                    itemMenu.setCheckState(0, QtCore.Qt.Unchecked)
-                    itemMenu.setData(0, QtCore.Qt.UserRole, domain)
-                    items.append(itemMenu)
-
-                if itemSource.childCount() == 0:
-                    item.removeChild(itemSource)
-
-        # Current workbench
-        if currentWb != "GlobalPanel":
-            treeItems(currentWb, None, None, True, None)
-        else:
-            treeItems(None, "Global", "GlobalPanel", True, None)
-
-        # Other workbenches
-        item = QtGui.QTreeWidgetItem(tree)
-        item.setText(0, "Workbenches")
-        for i in wbSort:
-            treeItems(i, None, None, False, item)
-
-        # Remove empty
-        for i in reversed(range(item.childCount())):
-            if item.child(i).childCount() == 0:
-                item.removeChild(item.child(i))
-
-        # Global menus
-        if currentWb != "GlobalPanel":
-            treeItems(None, "Global", "GlobalPanel", False, None)
-
-        # Toolbars (for copy mode only)
-        if editContext == "Copy":
-            tree.setHeaderLabel("Copy: None")
-            itemsToolbar = QtGui.QTreeWidgetItem(tree)
-            itemsToolbar.setText(0, "Toolbars")
-            tb = []
-            for i in mw.findChildren(QtGui.QToolBar):
-                if i.objectName():
-                    tb.append(i.objectName())
-            tb.sort()
-            for name in tb:
-                domain = "CPMenu" + "." + "Toolbar" + "." + name
-                itemTb = QtGui.QTreeWidgetItem(itemsToolbar)
-                itemTb.setText(0, name)
-                itemTb.setCheckState(0, QtCore.Qt.Unchecked)
-                itemTb.setData(0, QtCore.Qt.UserRole, domain)
-                items.append(itemTb)
-
-        # Current (for set mode only)
+        checked = None
         if editContext == "Set":
-            current = enabled.currentItem()
-            if current and (current.data(QtCore.Qt.UserRole)
-                            .startswith("CPMenu")):
-                data = current.data(QtCore.Qt.UserRole)
-                for i in items:
-                    if i.data(0, QtCore.Qt.UserRole) == data:
-                        i.setCheckState(0, QtCore.Qt.Checked)
-                        text = i.text(0)
-                        tree.setHeaderLabel("Set menu: " + text)
-
-                        parent = i.parent()
-                        while parent:
-                            parent.setExpanded(True)
-                            parent = parent.parent()
-
-        tree.blockSignals = False
-
-    def onChecked(item):
+            data = enabledCommand()
+            if data and data.startswith("CPMenu"):
+                checked = data
+        leFilter.blockSignals(True)
+        leFilter.clear()
+        leFilter.blockSignals(False)
+        model.load(currentWb, editContext == "Copy", checked)
+        expandTree()
+        if editContext == "Copy":
+            model.setTitle("Copy: None")
+        else:
+            model.setTitle("Set menu: None")
+            index = model.checkedIndex()
+            if index.isValid():
+                model.setTitle("Set menu: " + index.data())
+                parent = index.parent()
+                while parent.isValid():
+                    tree.expand(parent)
+                    parent = parent.parent()
+                tree.scrollTo(index)
+
+    def onFilter():
+        """Filter menus by name or workbench."""
+        model.setFilter(leFilter.text())
+        expandTree()
+
+    filterTimer.timeout.connect(onFilter)
+
+    def onFilterEdited():
+        """Filter after typing pauses."""
+        filterTimer.start()
+
+    leFilter.textEdited.connect(onFilterEdited)
+
+    def onChecked(data, text):
         """Copy or set menu."""
         global copyDomain
-        tree.blockSignals = True
-        if item.checkState(0) == QtCore.Qt.Checked:
-            for i in items:
-                if i.checkState(0) == QtCore.Qt.Checked and i is not item:
-                    i.setCheckState(0, QtCore.Qt.Unchecked)
-            data = item.data(0, QtCore.Qt.UserRole)
-        else:
-            data = None
-
-        text = item.text(0)
-
         if editContext == "Set" and data:
-            tree.setHeaderLabel("Set menu: " + text)
-            enabled.currentItem().setData(QtCore.Qt.UserRole,
-                                          item.data(0, QtCore.Qt.UserRole))
+            model.setTitle("Set menu: " + text)
+            enabledModel.setData(enabled.currentIndex(), data)
             saveEnabled()
         elif editContext == "Set" and not data:
-            tree.setHeaderLabel("Set menu: None")
-            enabled.currentItem().setData(QtCore.Qt.UserRole, "CPMenu")
+            model.setTitle("Set menu: None")
+            enabledModel.setData(enabled.currentIndex(), "CPMenu")
             saveEnabled()
         elif editContext == "Copy" and data:
-            tree.setHeaderLabel("Copy: " + text)
+            model.setTitle("Copy: " + text)
             copyDomain = data
         elif editContext == "Copy" and not data:
-            tree.setHeaderLabel("Copy: None")
+            model.setTitle("Copy: None")
             copyDomain = None
         else:
             pass
-        tree.blockSignals = False
+
+    model.menuChecked.connect(onChecked)
 
     def onEditDone():
         """Switch to general preferences."""
         global copyDomain
-        tree.itemChanged.disconnect(onChecked)
-        del items[:]
-        tree.clear()
-
+        session.flush()
         if copyDomain:
             wb = cBoxWb.itemData(cBoxWb.currentIndex())
             domain = "CPMenu" + "." + "User" + "." + wb
             if copyDomain.startswith("CPMenu.Toolbar"):
+                import CubeMenuToolbars as cpt
                 name = copyDomain.split(".")[2]
                 grpCopy = cpc.newGroup(domain)
                 uid = grpCopy.GetString("uuid")
@@ -918,7 +1172,8 @@ def edit(stack):
             btnEditDone.setDefault(True)
             btnEditDone.setFocus()
             updateTree()
-            tree.itemChanged.connect(onChecked)
+        else:
+            model.clear()
 
     stack.currentChanged.connect(onStack)
 
@@ -943,9 +1198,12 @@ def colorDialog(col):
                                        QtGui.QColorDialog.DontUseNativeDialog)
 
 
+@cpc.timed("settings")
 def settings(stack, btnSettingsDone):
     """Settings widget for preferences."""
 
+    cube = writer()
+
     # Colors rgba
     txtColor = 4278190080
     colFront = 2164260863
@@ -981,8 +1239,6 @@ def settings(stack, btnSettingsDone):
     loGlobal.addWidget(ckBoxGlobal)
     loMode.insertLayout(0, loGlobal)
 
-    if p.GetBool("Global", 0):
-        ckBoxGlobal.setChecked(True)
 
     def onCkBoxGlobal(checked):
         """Set global panel mode."""
@@ -1041,7 +1297,6 @@ def settings(stack, btnSettingsDone):
     spinSize = QtGui.QSpinBox()
     spinSize.setEnabled(False)
     spinSize.setRange(1, 10000)
-    spinSize.setValue(pCube.GetInt("CubeSize", 132))
 
     loSize = QtGui.QHBoxLayout()
     loSize.addWidget(ckSize)
@@ -1054,7 +1309,6 @@ def settings(stack, btnSettingsDone):
     spinOffsetX = QtGui.QSpinBox()
     spinOffsetX.setEnabled(False)
     spinOffsetX.setRange(0, 10000)
-    spinOffsetX.setValue(pCube.GetInt("OffsetX", 0))
 
     loOffsetX = QtGui.QHBoxLayout()
     loOffsetX.addWidget(ckOffsetX)
@@ -1067,7 +1321,6 @@ def settings(stack, btnSettingsDone):
     spinOffsetY = QtGui.QSpinBox()
     spinOffsetY.setEnabled(False)
     spinOffsetY.setRange(0, 10000)
-    spinOffsetY.setValue(pCube.GetInt("OffsetY", 0))
 
     loOffsetY = QtGui.QHBoxLayout()
     loOffsetY.addWidget(ckOffsetY)
@@ -1129,58 +1382,47 @@ def settings(stack, btnSettingsDone):
     loStyle.insertLayout(7, loButtonColor)
 
     # Style set initial values
-    if pCube.GetBool("ShowCS", 1):
-        ckShowCS.setChecked(True)
-
-    if p.GetBool("EnableSize", 0):
-        ckSize.setChecked(True)
-        spinSize.setEnabled(True)
-
-    if p.GetBool("EnableOffsetX", 0):
-        ckOffsetX.setChecked(True)
-        spinOffsetX.setEnabled(True)
-
-    if p.GetBool("EnableOffsetY", 0):
-        ckOffsetY.setChecked(True)
-        spinOffsetY.setEnabled(True)
-
-    if p.GetBool("EnableFrontColor", 0):
-        ckFrontColor.setChecked(True)
-        btnFrontColor.setEnabled(True)
-
-    if p.GetBool("EnableBackColor", 0):
-        ckBackColor.setChecked(True)
-        btnBackColor.setEnabled(True)
-
-    if p.GetBool("EnableHiliteColor", 0):
-        ckHiliteColor.setChecked(True)
-        btnHiliteColor.setEnabled(True)
-
-    if p.GetBool("EnableButtonColor", 0):
-        ckButtonColor.setChecked(True)
-        btnButtonColor.setEnabled(True)
-
-    btnFrontColor.setIcon(colorIcon(pCube.
-                                    GetUnsigned("FrontColor",
-                                                colFront)))
-    btnBackColor.setIcon(colorIcon(pCube.
-                                   GetUnsigned("BackColor",
-                                               colBack)))
-    btnHiliteColor.setIcon(colorIcon(pCube.
-                                     GetUnsigned("HiliteColor",
-                                                 colHilite)))
-    btnButtonColor.setIcon(colorIcon(pCube.
-                                     GetUnsigned("ButtonColor",
-                                                 colButton)))
+    def loadStyle():
+        """Set style widgets from parameters."""
+        loadOption(ckBoxGlobal, p.GetBool("Global", 0))
+        loadOption(ckShowCS, cube.get("Bool", "ShowCS", 1))
+        loadOption(ckSize, p.GetBool("EnableSize", 0), spinSize)
+        loadOption(ckOffsetX, p.GetBool("EnableOffsetX", 0), spinOffsetX)
+        loadOption(ckOffsetY, p.GetBool("EnableOffsetY", 0), spinOffsetY)
+        loadOption(ckFrontColor,
+                   p.GetBool("EnableFrontColor", 0),
+                   btnFrontColor)
+        loadOption(ckBackColor, p.GetBool("EnableBackColor", 0), btnBackColor)
+        loadOption(ckHiliteColor,
+                   p.GetBool("EnableHiliteColor", 0),
+                   btnHiliteColor)
+        loadOption(ckButtonColor,
+                   p.GetBool("EnableButtonColor", 0),
+                   btnButtonColor)
+
+        loadValue(spinSize, cube.get("Int", "CubeSize", 132))
+        loadValue(spinOffsetX, cube.get("Int", "OffsetX", 0))
+        loadValue(spinOffsetY, cube.get("Int", "OffsetY", 0))
+
+        btnFrontColor.setIcon(colorIcon(cube.get("Unsigned", "FrontColor",
+                                                 colFront)))
+        btnBackColor.setIcon(colorIcon(cube.get("Unsigned", "BackColor",
+                                                colBack)))
+        btnHiliteColor.setIcon(colorIcon(cube.get("Unsigned", "HiliteColor",
+                                                  colHilite)))
+        btnButtonColor.setIcon(colorIcon(cube.get("Unsigned", "ButtonColor",
+                                                  colButton)))
+
+    loadStyle()
 
     # Style functions
     # Style functions show CS
     def onCkShowCS(checked):
         """Show or hide CS."""
         if checked:
-            pCube.RemBool("ShowCS")
+            cube.remove("Bool", "ShowCS")
         else:
-            pCube.SetBool("ShowCS", 0)
+            cube.set("Bool", "ShowCS", 0)
 
     ckShowCS.stateChanged.connect(onCkShowCS)
 
@@ -1189,75 +1431,78 @@ def settings(stack, btnSettingsDone):
         """Enable cube size setting."""
         if checked:
             p.SetBool("EnableSize", 1)
-            pCube.SetInt("CubeSize", spinSize.value())
+            cube.set("Int", "CubeSize", spinSize.value())
             spinSize.setEnabled(True)
             spinSize.setFocus()
         else:
             p.RemBool("EnableSize")
-            pCube.RemInt("CubeSize")
+            cube.remove("Int", "CubeSize")
             spinSize.setEnabled(False)
 
         spinSize.blockSignals(True)
-        spinSize.setValue(pCube.GetInt("CubeSize", 132))
+        spinSize.setValue(cube.get("Int", "CubeSize", 132))
         spinSize.blockSignals(False)
 
     ckSize.stateChanged.connect(onCkSize)
 
     def onSpinSize(value):
         """Set cube size value."""
-        pCube.SetInt("CubeSize", value)
+        cube.set("Int", "CubeSize", value)
 
     spinSize.valueChanged.connect(onSpinSize)
+    spinSize.editingFinished.connect(cube.flush)
 
     # Style functions offset X
     def onCkOffsetX(checked):
         """Enable cube offset x setting."""
         if checked:
             p.SetBool("EnableOffsetX", 1)
-            pCube.SetInt("OffsetX", spinOffsetX.value())
+            cube.set("Int", "OffsetX", spinOffsetX.value())
             spinOffsetX.setEnabled(True)
             spinOffsetX.setFocus()
         else:
             p.RemBool("EnableOffsetX")
-            pCube.RemInt("OffsetX")
+            cube.remove("Int", "OffsetX")
             spinOffsetX.setEnabled(False)
 
         spinOffsetX.blockSignals(True)
-        spinOffsetX.setValue(pCube.GetInt("OffsetX", 0))
+        spinOffsetX.setValue(cube.get("Int", "OffsetX", 0))
         spinOffsetX.blockSignals(False)
 
     ckOffsetX.stateChanged.connect(onCkOffsetX)
 
     def onSpinOffsetX(value):
         """Set cube offset y value."""
-        pCube.SetInt("OffsetX", value)
+        cube.set("Int", "OffsetX", value)
 
     spinOffsetX.valueChanged.connect(onSpinOffsetX)
+    spinOffsetX.editingFinished.connect(cube.flush)
 
     # Style functions offset Y
     def onCkOffsetY(checked):
         """Enable cube offset y setting."""
         if checked:
             p.SetBool("EnableOffsetY", 1)
-            pCube.SetInt("OffsetY", spinOffsetY.value())
+            cube.set("Int", "OffsetY", spinOffsetY.value())
             spinOffsetY.setEnabled(True)
             spinOffsetY.setFocus()
         else:
             p.RemBool("EnableOffsetY")
-            pCube.RemInt("OffsetY")
+            cube.remove("Int", "OffsetY")
             spinOffsetY.setEnabled(False)
 
         spinOffsetY.blockSignals(True)
-        spinOffsetY.setValue(pCube.GetInt("OffsetY", 0))
+        spinOffsetY.setValue(cube.get("Int", "OffsetY", 0))
         spinOffsetY.blockSignals(False)
 
     ckOffsetY.stateChanged.connect(onCkOffsetY)
 
     def onSpinOffsetY(value):
         """Set cube offset y value."""
-        pCube.SetInt("OffsetY", value)
+        cube.set("Int", "OffsetY", value)
 
     spinOffsetY.valueChanged.connect(onSpinOffsetY)
+    spinOffsetY.editingFinished.connect(cube.flush)
 
     # Style functions color front
     def onCkFrontColor(checked):
@@ -1266,26 +1511,25 @@ def settings(stack, btnSettingsDone):
             p.SetBool("EnableFrontColor", 1)
             btnFrontColor.setEnabled(True)
             btnFrontColor.setFocus()
-            if not pCube.GetUnsigned("FrontColor"):
-                pCube.SetUnsigned("FrontColor", colFront)
+            if not cube.get("Unsigned", "FrontColor"):
+                cube.set("Unsigned", "FrontColor", colFront)
         else:
             p.RemBool("EnableFrontColor")
-            pCube.RemUnsigned("FrontColor")
+            cube.remove("Unsigned", "FrontColor")
             btnFrontColor.setEnabled(False)
 
-        btnFrontColor.setIcon(colorIcon(pCube.
-                                        GetUnsigned("FrontColor",
-                                                    colFront)))
+        btnFrontColor.setIcon(colorIcon(cube.get("Unsigned", "FrontColor",
+                                                 colFront)))
 
     ckFrontColor.stateChanged.connect(onCkFrontColor)
 
     def onBtnFrontColor():
         """Set the front color."""
-        col = colorDialog(pCube.GetUnsigned("FrontColor",
-                                            colFront))
+        col = colorDialog(cube.get("Unsigned", "FrontColor",
+                                   colFront))
         if col.isValid():
             btnFrontColor.setIcon(colorIcon(col.rgba()))
-            pCube.SetUnsigned("FrontColor", col.rgba())
+            cube.set("Unsigned", "FrontColor", col.rgba())
 
     btnFrontColor.clicked.connect(onBtnFrontColor)
 
@@ -1296,26 +1540,25 @@ def settings(stack, btnSettingsDone):
             p.SetBool("EnableBackColor", 1)
             btnBackColor.setEnabled(True)
             btnBackColor.setFocus()
-            if not pCube.GetUnsigned("BackColor"):
-                pCube.SetUnsigned("BackColor", colBack)
+            if not cube.get("Unsigned", "BackColor"):
+                cube.set("Unsigned", "BackColor", colBack)
         else:
             p.SetBool("EnableBackColor", 0)
-            pCube.RemUnsigned("BackColor")
+            cube.remove("Unsigned", "BackColor")
             btnBackColor.setEnabled(False)
 
-        btnBackColor.setIcon(colorIcon(pCube.
-                                       GetUnsigned("BackColor",
-                                                   colBack)))
+        btnBackColor.setIcon(colorIcon(cube.get("Unsigned", "BackColor",
+                                                colBack)))
 
     ckBackColor.stateChanged.connect(onCkBackColor)
 
     def onBtnBackColor():
         """Set the back color."""
-        col = colorDialog(pCube.GetUnsigned("BackColor",
-                                            colBack))
+        col = colorDialog(cube.get("Unsigned", "BackColor",
+                                   colBack))
         if col.isValid():
             btnBackColor.setIcon(colorIcon(col.rgba()))
-            pCube.SetUnsigned("BackColor", col.rgba())
+            cube.set("Unsigned", "BackColor", col.rgba())
 
     btnBackColor.clicked.connect(onBtnBackColor)
 
@@ -1326,26 +1569,25 @@ def settings(stack, btnSettingsDone):
             p.SetBool("EnableHiliteColor", 1)
             btnHiliteColor.setEnabled(True)
             btnHiliteColor.setFocus()
-            if not pCube.GetUnsigned("HiliteColor"):
-                pCube.SetUnsigned("HiliteColor", colHilite)
+            if not cube.get("Unsigned", "HiliteColor"):
+                cube.set("Unsigned", "HiliteColor", colHilite)
         else:
             p.RemBool("EnableHiliteColor")
-            pCube.RemUnsigned("HiliteColor")
+            cube.remove("Unsigned", "HiliteColor")
             btnHiliteColor.setEnabled(False)
 
-        btnHiliteColor.setIcon(colorIcon(pCube.
-                                         GetUnsigned("HiliteColor",
-                                                     colHilite)))
+        btnHiliteColor.setIcon(colorIcon(cube.get("Unsigned", "HiliteColor",
+                                                  colHilite)))
 
     ckHiliteColor.stateChanged.connect(onCkHiliteColor)
 
     def onBtnHiliteColor():
         """Set the hilite color."""
-        col = colorDialog(pCube.GetUnsigned("HiliteColor",
-                                            colHilite))
+        col = colorDialog(cube.get("Unsigned", "HiliteColor",
+                                   colHilite))
         if col.isValid():
             btnHiliteColor.setIcon(colorIcon(col.rgba()))
-            pCube.SetUnsigned("HiliteColor", col.rgba())
+            cube.set("Unsigned", "HiliteColor", col.rgba())
 
     btnHiliteColor.clicked.connect(onBtnHiliteColor)
 
@@ -1356,26 +1598,25 @@ def settings(stack, btnSettingsDone):
             p.SetBool("EnableButtonColor", 1)
             btnButtonColor.setEnabled(True)
             btnButtonColor.setFocus()
-            if not pCube.GetUnsigned("ButtonColor"):
-                pCube.SetUnsigned("ButtonColor", colButton)
+            if not cube.get("Unsigned", "ButtonColor"):
+                cube.set("Unsigned", "ButtonColor", colButton)
         else:
             p.SetBool("EnableButtonColor", 0)
-            pCube.RemUnsigned("ButtonColor")
+            cube.remove("Unsigned", "ButtonColor")
             btnButtonColor.setEnabled(False)
 
-        btnButtonColor.setIcon(colorIcon(pCube.
-                                         GetUnsigned("ButtonColor",
-                                                     colButton)))
+        btnButtonColor.setIcon(colorIcon(cube.get("Unsigned", "ButtonColor",
+                                                  colButton)))
 
     ckButtonColor.stateChanged.connect(onCkButtonColor)
 
     def onBtnButtonColor():
         """Set the button color."""
-        col = colorDialog(pCube.GetUnsigned("ButtonColor",
-                                            colButton))
+        col = colorDialog(cube.get("Unsigned", "ButtonColor",
+                                   colButton))
         if col.isValid():
             btnButtonColor.setIcon(colorIcon(col.rgba()))
-            pCube.SetUnsigned("ButtonColor", col.rgba())
+            cube.set("Unsigned", "ButtonColor", col.rgba())
 
     btnButtonColor.clicked.connect(onBtnButtonColor)
 
@@ -1401,7 +1642,6 @@ def settings(stack, btnSettingsDone):
     spinTextWeight = QtGui.QSpinBox()
     spinTextWeight.setEnabled(False)
     spinTextWeight.setRange(1, 99)
-    spinTextWeight.setValue(pCube.GetInt("FontWeight", 87))
 
     loTextWeight = QtGui.QHBoxLayout()
     loTextWeight.addWidget(ckTextWeight)
@@ -1414,7 +1654,6 @@ def settings(stack, btnSettingsDone):
     spinTextStretch = QtGui.QSpinBox()
     spinTextStretch.setEnabled(False)
     spinTextStretch.setRange(1, 1000)
-    spinTextStretch.setValue(pCube.GetInt("FontStretch", 62))
 
     loTextStretch = QtGui.QHBoxLayout()
     loTextStretch.addWidget(ckTextStretch)
@@ -1426,8 +1665,6 @@ def settings(stack, btnSettingsDone):
     ckFontString.setText("Font")
     btnFontString = QtGui.QPushButton()
     btnFontString.setEnabled(False)
-    btnFontString.setText(pCube.GetString("FontString",
-                                          "Font").split(",")[0])
 
     loFontString = QtGui.QHBoxLayout()
     loFontString.addWidget(ckFontString)
@@ -1507,55 +1744,43 @@ def settings(stack, btnSettingsDone):
     loTextRight.addWidget(leTextRight)
 
     # Text set initial values
-    if p.GetBool("EnableTextColor", 0):
-        ckTextColor.setChecked(True)
-        btnTextColor.setEnabled(True)
-
-    if p.GetBool("EnableTextWeight", 0):
-        ckTextWeight.setChecked(True)
-        spinTextWeight.setEnabled(True)
-
-    if p.GetBool("EnableTextStretch", 0):
-        ckTextStretch.setChecked(True)
-        spinTextStretch.setEnabled(True)
-
-    if p.GetBool("EnableFontString", 0):
-        ckFontString.setChecked(True)
-        btnFontString.setEnabled(True)
-
-    if p.GetBool("EnableTextFront", 0):
-        ckTextFront.setChecked(True)
-        leTextFront.setEnabled(True)
-
-    if p.GetBool("EnableTextRear", 0):
-        ckTextRear.setChecked(True)
-        leTextRear.setEnabled(True)
-
-    if p.GetBool("EnableTextTop", 0):
-        ckTextTop.setChecked(True)
-        leTextTop.setEnabled(True)
-
-    if p.GetBool("EnableTextBottom", 0):
-        ckTextBottom.setChecked(True)
-        leTextBottom.setEnabled(True)
-
-    if p.GetBool("EnableTextLeft", 0):
-        ckTextLeft.setChecked(True)
-        leTextLeft.setEnabled(True)
-
-    if p.GetBool("EnableTextRight", 0):
-        ckTextRight.setChecked(True)
-        leTextRight.setEnabled(True)
-
-    btnTextColor.setIcon(colorIcon(pCube.GetUnsigned("TextColor",
-                                                     txtColor)))
-
-    leTextFront.setText(pCube.GetString("TextFront", "FRONT"))
-    leTextRear.setText(pCube.GetString("TextRear", "REAR"))
-    leTextTop.setText(pCube.GetString("TextTop", "TOP"))
-    leTextBottom.setText(pCube.GetString("TextBottom", "BOTTOM"))
-    leTextLeft.setText(pCube.GetString("TextLeft", "LEFT"))
-    leTextRight.setText(pCube.GetString("TextRight", "RIGHT"))
+    def loadText():
+        """Set text widgets from parameters."""
+        loadOption(ckTextColor, p.GetBool("EnableTextColor", 0), btnTextColor)
+        loadOption(ckTextWeight,
+                   p.GetBool("EnableTextWeight", 0),
+                   spinTextWeight)
+        loadOption(ckTextStretch,
+                   p.GetBool("EnableTextStretch", 0),
+                   spinTextStretch)
+        loadOption(ckFontString,
+                   p.GetBool("EnableFontString", 0),
+                   btnFontString)
+        loadOption(ckTextFront, p.GetBool("EnableTextFront", 0), leTextFront)
+        loadOption(ckTextRear, p.GetBool("EnableTextRear", 0), leTextRear)
+        loadOption(ckTextTop, p.GetBool("EnableTextTop", 0), leTextTop)
+        loadOption(ckTextBottom,
+                   p.GetBool("EnableTextBottom", 0),
+                   leTextBottom)
+        loadOption(ckTextLeft, p.GetBool("EnableTextLeft", 0), leTextLeft)
+        loadOption(ckTextRight, p.GetBool("EnableTextRight", 0), leTextRight)
+
+        loadValue(spinTextWeight, cube.get("Int", "FontWeight", 87))
+        loadValue(spinTextStretch, cube.get("Int", "FontStretch", 62))
+        btnFontString.setText(cube.get("String", "FontString",
+                                       "Font").split(",")[0])
+
+        btnTextColor.setIcon(colorIcon(cube.get("Unsigned", "TextColor",
+                                                txtColor)))
+
+        leTextFront.setText(cube.get("String", "TextFront", "FRONT"))
+        leTextRear.setText(cube.get("String", "TextRear", "REAR"))
+        leTextTop.setText(cube.get("String", "TextTop", "TOP"))
+        leTextBottom.setText(cube.get("String", "TextBottom", "BOTTOM"))
+        leTextLeft.setText(cube.get("String", "TextLeft", "LEFT"))
+        leTextRight.setText(cube.get("String", "TextRight", "RIGHT"))
+
+    loadText()
 
     # Text functions
     # Text functions color
@@ -1565,25 +1790,24 @@ def settings(stack, btnSettingsDone):
             p.SetBool("EnableTextColor", 1)
             btnTextColor.setEnabled(True)
             btnTextColor.setFocus()
-            if not pCube.GetUnsigned("TextColor"):
-                pCube.SetUnsigned("TextColor", txtColor)
+            if not cube.get("Unsigned", "TextColor"):
+                cube.set("Unsigned", "TextColor", txtColor)
         else:
             p.RemBool("EnableTextColor")
-            pCube.RemUnsigned("TextColor")
+            cube.remove("Unsigned", "TextColor")
             btnTextColor.setEnabled(False)
 
-        btnTextColor.setIcon(colorIcon(pCube.
-                                       GetUnsigned("TextColor",
-                                                   txtColor)))
+        btnTextColor.setIcon(colorIcon(cube.get("Unsigned", "TextColor",
+                                                txtColor)))
 
     ckTextColor.stateChanged.connect(onCkTextColor)
 
     def onBtnTextColor():
         """Set the text color."""
-        col = colorDialog(pCube.GetUnsigned("TextColor", txtColor))
+        col = colorDialog(cube.get("Unsigned", "TextColor", txtColor))
         if col.isValid():
             btnTextColor.setIcon(colorIcon(col.rgba()))
-            pCube.SetUnsigned("TextColor", col.rgba())
+            cube.set("Unsigned", "TextColor", col.rgba())
 
     btnTextColor.clicked.connect(onBtnTextColor)
 
@@ -1592,50 +1816,52 @@ def settings(stack, btnSettingsDone):
         """Enable font weight setting."""
         if checked:
             p.SetBool("EnableTextWeight", 1)
-            pCube.SetInt("FontWeight", spinTextWeight.value())
+            cube.set("Int", "FontWeight", spinTextWeight.value())
             spinTextWeight.setEnabled(True)
             spinTextWeight.setFocus()
         else:
             p.RemBool("EnableTextWeight")
-            pCube.RemInt("FontWeight")
+            cube.remove("Int", "FontWeight")
             spinTextWeight.setEnabled(False)
 
         spinTextWeight.blockSignals(True)
-        spinTextWeight.setValue(pCube.GetInt("FontWeight", 87))
+        spinTextWeight.setValue(cube.get("Int", "FontWeight", 87))
         spinTextWeight.blockSignals(False)
 
     ckTextWeight.stateChanged.connect(onCkTextWeight)
 
     def onSpinTextWeight(value):
         """Set font weight value."""
-        pCube.SetInt("FontWeight", value)
+        cube.set("Int", "FontWeight", value)
 
     spinTextWeight.valueChanged.connect(onSpinTextWeight)
+    spinTextWeight.editingFinished.connect(cube.flush)
 
     # Text functions stretch
     def onCkTextStretch(checked):
         """Enable font stretch setting."""
         if checked:
             p.SetBool("EnableTextStretch", 1)
-            pCube.SetInt("FontStretch", spinTextStretch.value())
+            cube.set("Int", "FontStretch", spinTextStretch.value())
             spinTextStretch.setEnabled(True)
             spinTextStretch.setFocus()
         else:
             p.RemBool("EnableTextStretch")
-            pCube.RemInt("FontStretch")
+            cube.remove("Int", "FontStretch")
             spinTextStretch.setEnabled(False)
 
         spinTextStretch.blockSignals(True)
-        spinTextStretch.setValue(pCube.GetInt("FontStretch", 62))
+        spinTextStretch.setValue(cube.get("Int", "FontStretch", 62))
         spinTextStretch.blockSignals(False)
 
     ckTextStretch.stateChanged.connect(onCkTextStretch)
 
     def onSpinTextStretch(value):
         """Set font stretch value."""
-        pCube.SetInt("FontStretch", value)
+        cube.set("Int", "FontStretch", value)
 
     spinTextStretch.valueChanged.connect(onSpinTextStretch)
+    spinTextStretch.editingFinished.connect(cube.flush)
 
     # Font string
     def onCkFontString(checked):
@@ -1646,10 +1872,10 @@ def settings(stack, btnSettingsDone):
             btnFontString.setFocus()
         else:
             p.RemBool("EnableFontString")
-            pCube.RemString("FontString")
+            cube.remove("String", "FontString")
             btnFontString.setEnabled(False)
 
-        s = pCube.GetString("FontString", "Font")
+        s = cube.get("String", "FontString", "Font")
         s = s.split(",")[0]
         btnFontString.setText(s)
 
@@ -1658,7 +1884,7 @@ def settings(stack, btnSettingsDone):
     def onBtnFontString():
         """Save as font string."""
         font = QtGui.QFont()
-        s = pCube.GetString("FontString")
+        s = cube.get("String", "FontString")
         if s:
             font.fromString(s)
         # Reversed on some older Qt5/PySide2 versions
@@ -1670,7 +1896,7 @@ def settings(stack, btnSettingsDone):
             ok = fontTemp
             font = okTemp
         if ok:
-            pCube.SetString("FontString", font.toString())
+            cube.set("String", "FontString", font.toString())
             s = font.toString()
             s = s.split(",")[0]
             btnFontString.setText(s)
@@ -1686,16 +1912,16 @@ def settings(stack, btnSettingsDone):
             leTextFront.setFocus()
         else:
             p.RemBool("EnableTextFront")
-            pCube.RemString("TextFront")
+            cube.remove("String", "TextFront")
             leTextFront.setEnabled(False)
 
-        leTextFront.setText(pCube.GetString("TextFront", "FRONT"))
+        leTextFront.setText(cube.get("String", "TextFront", "FRONT"))
 
     ckTextFront.stateChanged.connect(onCkTextFront)
 
     def onLeTextFront():
         """Set the front text."""
-        pCube.SetString("TextFront", leTextFront.text())
+        cube.set("String", "TextFront", leTextFront.text())
 
     leTextFront.editingFinished.connect(onLeTextFront)
 
@@ -1708,16 +1934,16 @@ def settings(stack, btnSettingsDone):
             leTextRear.setFocus()
         else:
             p.RemBool("EnableTextRear")
-            pCube.RemString("TextRear")
+            cube.remove("String", "TextRear")
             leTextRear.setEnabled(False)
 
-        leTextRear.setText(pCube.GetString("TextRear", "REAR"))
+        leTextRear.setText(cube.get("String", "TextRear", "REAR"))
 
     ckTextRear.stateChanged.connect(onCkTextRear)
 
     def onLeTextRear():
         """Set the rear text."""
-        pCube.SetString("TextRear", leTextRear.text())
+        cube.set("String", "TextRear", leTextRear.text())
 
     leTextRear.editingFinished.connect(onLeTextRear)
 
@@ -1730,16 +1956,16 @@ def settings(stack, btnSettingsDone):
             leTextTop.setFocus()
         else:
             p.RemBool("EnableTextTop")
-            pCube.RemString("TextTop")
+            cube.remove("String", "TextTop")
             leTextTop.setEnabled(False)
 
-        leTextTop.setText(pCube.GetString("TextTop", "TOP"))
+        leTextTop.setText(cube.get("String", "TextTop", "TOP"))
 
     ckTextTop.stateChanged.connect(onCkTextTop)
 
     def onLeTextTop():
         """Set the top text."""
-        pCube.SetString("TextTop", leTextTop.text())
+        cube.set("String", "TextTop", leTextTop.text())
 
     leTextTop.editingFinished.connect(onLeTextTop)
 
@@ -1752,16 +1978,16 @@ def settings(stack, btnSettingsDone):
             leTextBottom.setFocus()
         else:
             p.RemBool("EnableTextBottom")
-            pCube.RemString("TextBottom")
+            cube.remove("String", "TextBottom")
             leTextBottom.setEnabled(False)
 
-        leTextBottom.setText(pCube.GetString("TextBottom", "BOTTOM"))
+        leTextBottom.setText(cube.get("String", "TextBottom", "BOTTOM"))
 
     ckTextBottom.stateChanged.connect(onCkTextBottom)
 
     def onLeTextBottom():
         """Set the bottom text."""
-        pCube.SetString("TextBottom", leTextBottom.text())
+        cube.set("String", "TextBottom", leTextBottom.text())
 
     leTextBottom.editingFinished.connect(onLeTextBottom)
 
@@ -1774,16 +2000,16 @@ def settings(stack, btnSettingsDone):
             leTextLeft.setFocus()
         else:
             p.RemBool("EnableTextLeft")
-            pCube.RemString("TextLeft")
+            cube.remove("String", "TextLeft")
             leTextLeft.setEnabled(False)
 
-        leTextLeft.setText(pCube.GetString("TextLeft", "LEFT"))
+        leTextLeft.setText(cube.get("String", "TextLeft", "LEFT"))
 
     ckTextLeft.stateChanged.connect(onCkTextLeft)
 
     def onLeTextLeft():
         """Set the left text."""
-        pCube.SetString("TextLeft", leTextLeft.text())
+        cube.set("String", "TextLeft", leTextLeft.text())
 
     leTextLeft.editingFinished.connect(onLeTextLeft)
 
@@ -1796,16 +2022,16 @@ def settings(stack, btnSettingsDone):
             leTextRight.setFocus()
         else:
             p.RemBool("EnableTextRight")
-            pCube.RemString("TextRight")
+            cube.remove("String", "TextRight")
             leTextRight.setEnabled(False)
 
-        leTextRight.setText(pCube.GetString("TextRight", "RIGHT"))
+        leTextRight.setText(cube.get("String", "TextRight", "RIGHT"))
 
     ckTextRight.stateChanged.connect(onCkTextRight)
 
     def onLeTextRight():
         """Set the right text."""
-        pCube.SetString("TextRight", leTextRight.text())
+        cube.set("String", "TextRight", leTextRight.text())
 
     leTextRight.editingFinished.connect(onLeTextRight)
 
@@ -1839,7 +2065,19 @@ def settings(stack, btnSettingsDone):
         if n == 2:
             btnSettingsDone.setDefault(True)
             btnSettingsDone.setFocus()
+        else:
+            cube.flush()
 
     stack.currentChanged.connect(onStack)
 
+    def onRefresh():
+        """Reload settings if parameters changed."""
+        if paramsChanged():
+            loadStyle()
+            loadText()
+
+    refreshers.append(onRefresh)
+    styleLoaders.append(loadStyle)
+    styleLoaders.append(loadText)
+
     return widgetSettings
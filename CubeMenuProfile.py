@@ -0,0 +1,132 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+
+"""Cube menu for FreeCAD - Profile.
+
+Capture cProfile and tracemalloc data of the next menu shows and
+preferences dialog opens. Enabled by the Count parameter of the Profile
+group, the number of captures left, see CubeMenu.captureProfiles. The
+group is not observed, so captures don't invalidate cached menus."""
+
+
+import os
+import time
+import cProfile
+import FreeCAD as App
+import CubeMenuCommon as cpc
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+pp = cpc.profile
+state = {"active": False}
+suffixes = (".prof", ".tracemalloc")
+
+
+def profileDir():
+    """Capture directory, the Directory parameter or the CubeMenu
+       Profiles folder in the user data directory."""
+    directory = pp.GetString("Directory")
+    if not directory:
+        directory = os.path.join(App.getUserAppDataDir(),
+                                 "CubeMenu",
+                                 "Profiles")
+    return directory
+
+
+def capture(name, function, *args, **kwargs):
+    """Call the function under cProfile and tracemalloc (Memory
+       parameter) and write the capture files. Nested calls are not
+       captured separately."""
+    if state["active"]:
+        return function(*args, **kwargs)
+    pp.SetInt("Count", max(pp.GetInt("Count", 0) - 1, 0))
+    memory = tracemalloc and pp.GetBool("Memory", 1)
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(pp.GetInt("Frames", 10))
+    profile = cProfile.Profile()
+    state["active"] = True
+    start = time.time()
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        state["active"] = False
+        ms = (time.time() - start) * 1000
+        snapshot = None
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+        if started:
+            tracemalloc.stop()
+        write(name, ms, profile, snapshot)
+
+
+def write(name, ms, profile, snapshot):
+    """Write capture files named after the time, operation and duration,
+       then rotate the directory."""
+    directory = profileDir()
+    now = time.time()
+    stem = "CubeMenu-%s-%03d-%s-%dms" % (time.strftime("%Y%m%d-%H%M%S",
+                                                       time.localtime(now)),
+                                         int(now * 1000) % 1000,
+                                         name,
+                                         ms)
+    path = os.path.join(directory, stem)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        profile.dump_stats(path + ".prof")
+        if snapshot:
+            snapshot.dump(path + ".tracemalloc")
+    except (IOError, OSError) as e:
+        App.Console.PrintWarning("Cube menu profile: " + str(e) + "\n")
+        return
+    App.Console.PrintMessage("Cube menu profile: " + path + ".prof\n")
+    rotate(directory,
+           pp.GetInt("Keep", 20),
+           pp.GetInt("Size", 51200) * 1024)
+
+
+def rotate(directory, keep, cap):
+    """Remove the oldest captures over keep captures or cap bytes."""
+    captures = {}
+    try:
+        for f in os.listdir(directory):
+            if f.startswith("CubeMenu-") and f.endswith(suffixes):
+                stem = os.path.splitext(f)[0]
+                size = os.path.getsize(os.path.join(directory, f))
+                captures.setdefault(stem, []).append((f, size))
+    except OSError:
+        return
+    total = sum(s for files in captures.values() for f, s in files)
+    # Names start with the time, oldest first
+    for stem in sorted(captures):
+        if len(captures) <= keep and total <= cap:
+            break
+        for f, size in captures.pop(stem):
+            try:
+                os.remove(os.path.join(directory, f))
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,333 @@
+# Cube menu for FreeCAD.
+# Copyright (C) 2015, 2016 (as part of TabBar) triplus @ FreeCAD
+# Copyright (C) 2017, 2018, 2019 (as part of CommandPanel) triplus @ FreeCAD
+# Copyright (C) 2020 triplus @ FreeCAD
+#
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+
+
+"""Cube menu for FreeCAD - Stubs.
+
+In-memory stand-ins for the FreeCAD and FreeCADGui modules, to run the
+cube menu without FreeCAD. Used by the headless benchmarks:
+
+QT_QPA_PLATFORM=offscreen python CubeMenuBenchmark.py"""
+
+
+import sys
+import types
+import tempfile
+
+
+roots = {}
+workbenches = {}
+active = [None]
+state = {"mw": None, "userDir": None}
+
+icon = """/* XPM */
+static char * stub_xpm[] = {
+"2 2 1 1",
+"  c #4D7FBF",
+"  ",
+"  "};"""
+
+
+class ParameterNode(object):
+    """Stored parameter group, values, subgroups and observers."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self.groups = {}
+        self.values = {}
+        self.observers = []
+        self.writes = 0
+
+
+class ParameterGroup(object):
+    """In-memory parameter group with the ParameterGrp interface used by
+       cube menu. Writes are counted, observers are notified on change.
+       Like in FreeCAD, every lookup returns a new group object and the
+       observers attached through it are detached when it is destroyed."""
+
+    def __init__(self, node):
+        self.node = node
+        self.attached = []
+
+    def __del__(self):
+        for observer in self.attached:
+            if observer in self.node.observers:
+                self.node.observers.remove(observer)
+
+    def Attach(self, observer):
+        """Attach observer."""
+        self.node.observers.append(observer)
+        self.attached.append(observer)
+
+    def Detach(self, observer):
+        """Detach observer."""
+        if observer in self.node.observers:
+            self.node.observers.remove(observer)
+        if observer in self.attached:
+            self.attached.remove(observer)
+
+    def Notify(self, name):
+        """Notify observers about a change."""
+        for observer in list(self.node.observers):
+            observer.OnChange(self, name)
+
+    def GetGroup(self, name):
+        """Return subgroup, create it if needed."""
+        groups = self.node.groups
+        if name not in groups:
+            groups[name] = ParameterNode(name)
+        return ParameterGroup(groups[name])
+
+    def HasGroup(self, name):
+        """Check if subgroup exists."""
+        return name in self.node.groups
+
+    def GetGroups(self):
+        """Return subgroup names."""
+        return list(self.node.groups)
+
+    def RemGroup(self, name):
+        """Remove subgroup."""
+        if self.node.groups.pop(name, None) is not None:
+            self.Notify(name)
+
+    def Clear(self):
+        """Remove all values and subgroups."""
+        self.node.groups.clear()
+        self.node.values.clear()
+        self.Notify("")
+
+    def get(self, kind, name, default):
+        """Stored value or default."""
+        return self.node.values.get((kind, name), default)
+
+    def set(self, kind, name, value):
+        """Store value."""
+        self.node.values[(kind, name)] = value
+        self.node.writes += 1
+        self.Notify(name)
+
+    def remove(self, kind, name):
+        """Remove value."""
+        if self.node.values.pop((kind, name), None) is not None:
+            self.Notify(name)
+
+    def GetBool(self, name, default=False):
+        """Boolean value."""
+        return bool(self.get("Bool", name, default))
+
+    def SetBool(self, name, value):
+        """Set boolean value."""
+        self.set("Bool", name, bool(value))
+
+    def RemBool(self, name):
+        """Remove boolean value."""
+        self.remove("Bool", name)
+
+    def GetInt(self, name, default=0):
+        """Integer value."""
+        return self.get("Int", name, default)
+
+    def SetInt(self, name, value):
+        """Set integer value."""
+        self.set("Int", name, int(value))
+
+    def RemInt(self, name):
+        """Remove integer value."""
+        self.remove("Int", name)
+
+    def GetUnsigned(self, name, default=0):
+        """Unsigned value."""
+        return self.get("Unsigned", name, default)
+
+    def SetUnsigned(self, name, value):
+        """Set unsigned value."""
+        self.set("Unsigned", name, int(value))
+
+    def RemUnsigned(self, name):
+        """Remove unsigned value."""
+        self.remove("Unsigned", name)
+
+    def GetString(self, name, default=""):
+        """String value."""
+        return self.get("String", name, default)
+
+    def SetString(self, name, value):
+        """Set string value."""
+        self.set("String", name, value)
+
+    def RemString(self, name):
+        """Remove string value."""
+        self.remove("String", name)
+
+
+class Console(object):
+    """Report view stand-in, printing to the standard streams."""
+
+    def PrintMessage(self, text):
+        """Print message."""
+        sys.stdout.write(text)
+
+    def PrintWarning(self, text):
+        """Print warning."""
+        sys.stderr.write(text)
+
+    def PrintError(self, text):
+        """Print error."""
+        sys.stderr.write(text)
+
+
+class Workbench(object):
+    """Workbench stand-in."""
+
+    MenuText = "Stub"
+    ToolTip = "Stub workbench"
+    Icon = icon
+
+
+def ParamGet(path):
+    """Parameter group for the path."""
+    if path not in roots:
+        roots[path] = ParameterNode(path)
+    return ParameterGroup(roots[path])
+
+
+def Version():
+    """FreeCAD version."""
+    return ["0", "19", "0", "Stub"]
+
+
+def getUserAppDataDir():
+    """Temporary user data directory, created on first use."""
+    if state["userDir"] is None:
+        state["userDir"] = tempfile.mkdtemp(prefix="CubeMenuStubs")
+    return state["userDir"] + "/"
+
+
+def addDocumentObserver(observer):
+    """Document observers are not notified."""
+    pass
+
+
+def getMainWindow():
+    """Main window."""
+    return state["mw"]
+
+
+def listWorkbenches():
+    """Dictionary of workbench instances."""
+    return dict(workbenches)
+
+
+def activeWorkbench():
+    """Active workbench instance."""
+    return workbenches[active[0]]
+
+
+def activateWorkbench(name):
+    """Activate workbench and emit workbenchActivated."""
+    active[0] = name
+    state["mw"].workbenchActivated.emit(name)
+
+
+def addWorkbench(name, text=None):
+    """Add a workbench instance with the class name."""
+    cls = type(str(name), (Workbench,), {"MenuText": text or name})
+    workbenches[name] = cls()
+    if active[0] is None:
+        active[0] = name
+    return workbenches[name]
+
+
+def removeWorkbench(name):
+    """Remove the workbench instance."""
+    workbenches.pop(name, None)
+    if active[0] == name:
+        active[0] = sorted(workbenches)[0] if workbenches else None
+
+
+def pyside():
+    """Provide the PySide module FreeCAD ships, a compatibility layer
+       with QtWidgets classes in QtGui, on top of PySide2."""
+    try:
+        import PySide
+        return
+    except ImportError:
+        pass
+    import PySide2
+    from PySide2 import QtCore, QtGui, QtWidgets
+    if PySide2.__version_info__[:2] < (5, 14) and sys.version_info >= (3, 8):
+        # PySide2 5.13 flag operators fail on Python 3.8 and above
+        def combine(a, b):
+            return QtCore.Qt.ItemFlags(int(a) | int(b))
+
+        QtCore.Qt.ItemFlag.__or__ = combine
+        QtCore.Qt.ItemFlags.__or__ = combine
+        QtCore.Qt.ItemFlags.__ior__ = combine
+    gui = types.ModuleType("PySide.QtGui")
+    gui.__dict__.update(QtGui.__dict__)
+    gui.__dict__.update(QtWidgets.__dict__)
+    module = types.ModuleType("PySide")
+    module.QtCore = QtCore
+    module.QtGui = gui
+    sys.modules["PySide"] = module
+    sys.modules["PySide.QtCore"] = QtCore
+    sys.modules["PySide.QtGui"] = gui
+
+
+def install(count=10):
+    """Install FreeCAD and FreeCADGui stand-ins with the main window and
+       count workbenches. Nothing is done inside FreeCAD."""
+    if "FreeCADGui" in sys.modules:
+        return sys.modules["FreeCADGui"]
+    pyside()
+    from PySide import QtCore
+    from PySide import QtGui
+
+    if not QtGui.QApplication.instance():
+        QtGui.QApplication(sys.argv[:1])
+
+    class MainWindow(QtGui.QMainWindow):
+        """Main window with the FreeCAD signals."""
+
+        workbenchActivated = QtCore.Signal(str)
+        mainWindowClosed = QtCore.Signal()
+
+    state["mw"] = MainWindow()
+    state["mw"].setProperty("eventLoop", True)
+    menu = QtGui.QMenu(state["mw"])
+    menu.setObjectName("NaviCube_Menu")
+
+    for i in range(count):
+        addWorkbench("Stub%dWorkbench" % i, "Stub %d" % i)
+
+    app = types.ModuleType("FreeCAD")
+    for name in ("ParamGet", "Version", "getUserAppDataDir",
+                 "addDocumentObserver"):
+        setattr(app, name, globals()[name])
+    app.Console = Console()
+    gui = types.ModuleType("FreeCADGui")
+    for name in ("getMainWindow", "listWorkbenches", "activeWorkbench",
+                 "activateWorkbench", "addWorkbench", "removeWorkbench",
+                 "Workbench"):
+        setattr(gui, name, globals()[name])
+    sys.modules["FreeCAD"] = app
+    sys.modules["FreeCADGui"] = gui
+    return gui